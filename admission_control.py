@@ -0,0 +1,283 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import metrics
+
+PRIORITY_ORDER = "order"
+PRIORITY_FAQ = "faq"
+
+admitted_total = metrics.registry.counter(
+    "chat_admitted_total", "Chat messages admitted, by priority.", ("priority",)
+)
+rejected_total = metrics.registry.counter(
+    "chat_rejected_total", "Chat requests shed (rate_limited = 429, overloaded = 503).", ("reason", "priority")
+)
+queue_seconds = metrics.registry.histogram(
+    "chat_admission_wait_seconds", "Time admitted chat requests waited for an in-flight slot.", ("priority",)
+)
+
+
+class Rejected(Exception):
+    """Raised by ``AdmissionController.admit``; maps to an HTTP status with Retry-After."""
+
+    def __init__(self, status: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBuckets:
+    """Per-key token buckets refilled at ``rate`` tokens/second up to ``burst``.
+
+    Only the ``max_keys`` most recently seen keys are kept; a key that falls
+    out starts again with a full bucket, which is what an idle key would
+    have refilled to anyway.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys=100_000):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.max_keys = int(max_keys)
+        self._buckets = OrderedDict()  # key -> (tokens, last refill)
+        self._lock = threading.Lock()
+
+    def take(self, costs: dict) -> float:
+        """Take ``costs[key]`` tokens from each key, all or nothing.
+
+        Returns 0.0 on success, otherwise the seconds until every bucket
+        would have enough tokens. Costs must not exceed the burst.
+        """
+        now = time.monotonic()
+        with self._lock:
+            levels = {}
+            wait = 0.0
+            for key, cost in costs.items():
+                tokens, last = self._buckets.get(key, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                levels[key] = tokens
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / self.rate)
+            if wait > 0.0:
+                for key, tokens in levels.items():
+                    self._store(key, tokens, now)
+                return wait
+            for key, cost in costs.items():
+                self._store(key, levels[key] - cost, now)
+            return 0.0
+
+    def refund(self, costs: dict) -> None:
+        """Give back tokens taken for a request that was then turned away."""
+        with self._lock:
+            for key, cost in costs.items():
+                if key in self._buckets:
+                    tokens, last = self._buckets[key]
+                    self._store(key, min(self.burst, tokens + float(cost)), last)
+
+    def _store(self, key, tokens, now) -> None:
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionController:
+    """Rate limits per user and caps concurrent chat messages.
+
+    Every message in a request takes a token from its user's bucket (429
+    when empty) and then one of ``max_in_flight`` slots, waiting up to
+    ``queue_timeout`` seconds (503 when none frees up, or straight away
+    when ``max_queue`` requests are already waiting); tokens are refunded
+    when no slot is granted. ``order_reserved`` slots are only usable by
+    order-intent messages, and freed slots go to waiting orders before any
+    waiting FAQ query. Batches are split with ``chunks`` into pieces that
+    fit the burst and the slots. A rate or limit of 0 disables that check.
+    """
+
+    def __init__(self, user_rate=2.0, user_burst=10, max_in_flight=64, order_reserved=8,
+                 queue_timeout=1.0, max_queue=256, max_users=100_000):
+        self.buckets = TokenBuckets(user_rate, user_burst, max_users) if user_rate > 0 else None
+        self.max_in_flight = int(max_in_flight)
+        self.order_reserved = max(0, min(int(order_reserved), self.max_in_flight - 1)) if self.max_in_flight > 0 else 0
+        self.queue_timeout = max(0.0, float(queue_timeout))
+        self.max_queue = int(max_queue)
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = {PRIORITY_ORDER: 0, PRIORITY_FAQ: 0}
+        self.admitted = {PRIORITY_ORDER: 0, PRIORITY_FAQ: 0}
+        self.rejected = {"rate_limited": 0, "overloaded": 0}
+        self.max_wait_ms = 0.0
+        self.total_wait_ms = 0.0
+        self.queued = 0
+
+    # ------------------------------
+    # Slots
+    # ------------------------------
+    def _fits(self, counts) -> bool:
+        """Whether ``counts`` could ever be admitted (FAQ messages leave the reserved slots free)."""
+        if self.max_in_flight <= 0:
+            return True
+        faq = counts.get(PRIORITY_FAQ, 0)
+        return (sum(counts.values()) <= self.max_in_flight
+                and faq <= self.max_in_flight - self.order_reserved)
+
+    def _can_enter(self, counts, waiting_as=None) -> bool:
+        faq = counts.get(PRIORITY_FAQ, 0)
+        if self.in_flight + sum(counts.values()) > self.max_in_flight:
+            return False
+        if not faq:
+            return True
+        if self.in_flight + faq > self.max_in_flight - self.order_reserved:
+            return False
+        # FAQ queries step aside for orders waiting in other requests
+        waiting_orders = self.waiting[PRIORITY_ORDER] - (waiting_as == PRIORITY_ORDER)
+        return waiting_orders == 0
+
+    def _acquire(self, counts, priority) -> float:
+        """Take every slot in ``counts`` at once; returns seconds waited or raises Rejected."""
+        total = sum(counts.values())
+        with self._cond:
+            if self._can_enter(counts):
+                self.in_flight += total
+                return 0.0
+            if sum(self.waiting.values()) >= self.max_queue or self.queue_timeout <= 0:
+                self._reject("overloaded", priority, self.queue_timeout or 1.0)
+            start = time.perf_counter()
+            deadline = start + self.queue_timeout
+            self.waiting[priority] += 1
+            self.queued += 1
+            try:
+                while not self._can_enter(counts, priority):
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self._reject("overloaded", priority, self.queue_timeout)
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting[priority] -= 1
+                # An order giving up may unblock FAQ waiters
+                self._cond.notify_all()
+            self.in_flight += total
+            return time.perf_counter() - start
+
+    def _release(self, count) -> None:
+        with self._cond:
+            self.in_flight -= count
+            self._cond.notify_all()
+
+    def _reject(self, reason, priority, retry_after):
+        self.rejected[reason] += 1
+        rejected_total.inc(reason, priority)
+        status = 429 if reason == "rate_limited" else 503
+        raise Rejected(status, reason, retry_after)
+
+    def _take_tokens(self, user_costs, priority, pace) -> None:
+        while True:
+            wait = self.buckets.take(user_costs)
+            if wait == 0.0:
+                return
+            if not pace:
+                with self._cond:
+                    self._reject("rate_limited", priority, wait)
+            # Later chunks of an admitted batch wait for their tokens instead
+            time.sleep(wait)
+
+    # ------------------------------
+    # Public API
+    # ------------------------------
+    def chunks(self, user_ids, priorities) -> list:
+        """Split a batch into contiguous (start, end) ranges that ``admit`` can take whole.
+
+        No range needs more than a full bucket from any one user or more
+        slots than its priorities may hold at once.
+        """
+        per_user_cap = math.floor(self.buckets.burst) if self.buckets is not None else math.inf
+        ranges = []
+        start = 0
+        users, counts = {}, {}
+        for i, (user_id, priority) in enumerate(zip(user_ids, priorities)):
+            key = str(user_id)
+            next_counts = dict(counts)
+            next_counts[priority] = next_counts.get(priority, 0) + 1
+            if i > start and (users.get(key, 0) + 1 > per_user_cap or not self._fits(next_counts)):
+                ranges.append((start, i))
+                start = i
+                users, next_counts = {}, {priority: 1}
+            users[key] = users.get(key, 0) + 1
+            counts = next_counts
+        if start < len(user_ids):
+            ranges.append((start, len(user_ids)))
+        return ranges
+
+    @contextmanager
+    def admit(self, user_costs: dict, priorities=(PRIORITY_FAQ,), pace=False):
+        """Hold one in-flight slot per message for the block.
+
+        ``user_costs`` maps user_id -> tokens to take and ``priorities`` has
+        one entry per message; all slots are taken in one step. With
+        ``pace`` (the later chunks of a batch) an empty bucket is waited
+        for rather than rejected. Raises Rejected before the block runs
+        when a limit is hit.
+        """
+        counts = {}
+        for priority in priorities:
+            counts[priority] = counts.get(priority, 0) + 1
+        top = PRIORITY_ORDER if PRIORITY_ORDER in counts else PRIORITY_FAQ
+
+        too_costly = self.buckets is not None and max(user_costs.values(), default=0) > self.buckets.burst
+        if too_costly or not self._fits(counts):
+            raise ValueError("request can never be admitted whole; split it with chunks()")
+        if self.buckets is not None:
+            self._take_tokens(user_costs, top, pace)
+
+        if self.max_in_flight <= 0:
+            waited = 0.0
+        else:
+            try:
+                waited = self._acquire(counts, top)
+            except Rejected:
+                if self.buckets is not None:
+                    self.buckets.refund(user_costs)
+                raise
+        with self._cond:
+            for priority, count in counts.items():
+                self.admitted[priority] += count
+            self.total_wait_ms += waited * 1000
+            self.max_wait_ms = max(self.max_wait_ms, waited * 1000)
+        for priority, count in counts.items():
+            admitted_total.inc(priority, amount=count)
+        if self.max_in_flight > 0:
+            queue_seconds.observe(waited, top)
+        try:
+            yield
+        finally:
+            if self.max_in_flight > 0:
+                self._release(sum(counts.values()))
+
+    def stats(self) -> dict:
+        with self._cond:
+            admitted = sum(self.admitted.values())
+            return {
+                "user_rate": self.buckets.rate if self.buckets else 0,
+                "user_burst": self.buckets.burst if self.buckets else 0,
+                "tracked_users": len(self.buckets) if self.buckets else 0,
+                "max_in_flight": self.max_in_flight,
+                "order_reserved": self.order_reserved,
+                "queue_timeout": self.queue_timeout,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "waiting": dict(self.waiting),
+                "admitted": dict(self.admitted),
+                "rejected": dict(self.rejected),
+                "queued": self.queued,
+                "avg_wait_ms": round(self.total_wait_ms / admitted, 3) if admitted else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+            }
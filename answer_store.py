@@ -0,0 +1,90 @@
+import json
+import os
+import numpy as np
+from text_utils import normalize_query
+
+ANSWER_OFFSETS_FILE = "answer_offsets.npy"
+ANSWER_BLOB_FILE = "answers.bin"
+QUESTION_LOOKUP_FILE = "question_lookup.json"
+
+ANSWER_OFFSETS_PATH = os.path.join("model", ANSWER_OFFSETS_FILE)
+ANSWER_BLOB_PATH = os.path.join("model", ANSWER_BLOB_FILE)
+QUESTION_LOOKUP_PATH = os.path.join("model", QUESTION_LOOKUP_FILE)
+
+# Sent when the index search finds no neighbour at all (approximate indexes
+# return row id -1, e.g. IVF when the probed lists are empty)
+NO_ANSWER = "❓ Sorry, I don't have an answer for that yet. Could you rephrase your question?"
+
+
+def write_answer_store(answers, offsets_path=ANSWER_OFFSETS_PATH, blob_path=ANSWER_BLOB_PATH):
+    """Write answers as one UTF-8 blob plus an int64 offsets array.
+
+    Answer ``i`` is ``blob[offsets[i]:offsets[i + 1]]``, so row ``i`` of the
+    FAISS index resolves to its answer without any search. Each file is
+    written under a temporary name and renamed into place, blob first, so
+    a reader that finds the offsets also finds the whole blob.
+    """
+    encoded = [str(answer).encode("utf-8") for answer in answers]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(chunk) for chunk in encoded])
+
+    tmp = f".{os.getpid()}.tmp"
+    with open(blob_path + tmp, "wb") as f:
+        f.write(b"".join(encoded))
+    os.replace(blob_path + tmp, blob_path)
+    # np.save appends .npy to names that don't already end with it
+    np.save(offsets_path + tmp + ".npy", offsets)
+    os.replace(offsets_path + tmp + ".npy", offsets_path)
+
+
+class AnswerStore:
+    """Read-only, memory-mapped view of the compiled answer table."""
+
+    def __init__(self, offsets_path=ANSWER_OFFSETS_PATH, blob_path=ANSWER_BLOB_PATH):
+        if not os.path.exists(offsets_path):
+            raise FileNotFoundError(
+                f"{offsets_path} not found: this build has no compiled answer table. "
+                "Run train_model.py to rebuild it."
+            )
+        self.offsets = np.load(offsets_path, mmap_mode="r")
+        if os.path.getsize(blob_path) > 0:
+            self.blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            self.blob = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get(self, row_id: int) -> str:
+        # FAISS reports "no neighbour" as -1, which would otherwise slice from the end
+        if row_id < 0:
+            raise IndexError(f"answer row {row_id} out of range")
+        start = int(self.offsets[row_id])
+        end = int(self.offsets[row_id + 1])
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+
+def write_question_lookup(question_texts, path=QUESTION_LOOKUP_PATH):
+    """Map each normalized training question to its first index row."""
+    lookup = {}
+    for row_id, question in enumerate(question_texts):
+        lookup.setdefault(normalize_query(question), row_id)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(lookup, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_question_lookup(path=QUESTION_LOOKUP_PATH) -> dict:
+    # Models trained before the lookup existed simply skip the fast path
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def open_answer_store(artifact_dir: str) -> AnswerStore:
+    return AnswerStore(
+        os.path.join(artifact_dir, ANSWER_OFFSETS_FILE),
+        os.path.join(artifact_dir, ANSWER_BLOB_FILE),
+    )
@@ -0,0 +1,46 @@
+import re
+from functools import lru_cache
+
+_TAG = re.compile(r"<(.*?)>")
+
+# Tags whose value depends on the user asking; all others are shared
+USER_TAGS = frozenset({"bill", "amount"})
+
+
+class AnswerTemplate:
+    """An answer split once into literal and tag segments.
+
+    ``segments`` alternates literal text and tag names (tags at odd
+    positions), so rendering is a single join with each distinct tag
+    resolved once. ``text`` keeps the answer as written.
+    """
+
+    __slots__ = ("text", "segments", "tags", "user_tags")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.segments = _TAG.split(text)
+        self.tags = frozenset(self.segments[1::2])
+        self.user_tags = self.tags & USER_TAGS
+
+    @property
+    def shared_tags(self):
+        return self.tags - USER_TAGS
+
+    def render(self, resolve) -> str:
+        if not self.tags:
+            return self.segments[0]
+        values = {tag: resolve(tag) for tag in self.tags}
+        parts = list(self.segments)
+        parts[1::2] = [values[tag] for tag in parts[1::2]]
+        return "".join(parts)
+
+
+@lru_cache(maxsize=65536)
+def compile_template(text: str) -> AnswerTemplate:
+    return AnswerTemplate(text)
+
+
+def compile_answer_store(store) -> list:
+    """Pre-parse every answer; row ``i`` of the index answers with ``templates[i]``."""
+    return [AnswerTemplate(store.get(row_id)) for row_id in range(len(store))]
@@ -1,55 +1,253 @@
 import datetime
-from flask import Flask, request, jsonify
+import json
+import time
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from sqlalchemy import func
-from Resturant_Project.config import SessionLocal
-from database.model import User, MenuItem, Order, OrderItem, ChatHistory, RestaurantInfo
-from sqlalchemy.exc import SQLAlchemyError
-from tag_model_handler import get_final_chat_response
+from Resturant_Project.config import (
+    SessionLocal, engine, PRELOAD_MODEL,
+    CHAT_LOG_WRITE_BEHIND, CHAT_LOG_QUEUE_SIZE, CHAT_LOG_BATCH_SIZE, CHAT_LOG_FLUSH_INTERVAL_MS, CHAT_LOG_PUT_TIMEOUT_MS,
+    BULK_ORDER_CHUNK_SIZE, RESPONSE_CACHE_SIZE, PROFILE_SLOW_REQUEST_MS, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_DIR,
+    CHAT_USER_RATE, CHAT_USER_BURST, CHAT_MAX_IN_FLIGHT, CHAT_ORDER_RESERVED, CHAT_QUEUE_TIMEOUT, CHAT_MAX_QUEUE,
+    QUERY_COUNT_HEADER,
+)
+from database.model import User, Order, OrderItem, ChatHistory
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from database.pool_stats import PoolStats
+from database.query_counter import ThreadQueryCounts
+from chat_log_writer import create_chat_log_writer
+from bulk_orders import ingest_orders, iter_json_orders, iter_jsonl_orders
+from model_runtime import runtime, preload
+from reference_data import get_snapshot, peek_snapshot, invalidate_reference_data, track_reference_writes
+from menu_matcher import invalidate_menu
+from response_cache import ResponseCache
+from admission_control import AdmissionController, Rejected, PRIORITY_ORDER, PRIORITY_FAQ
+from sales_rollups import record_orders, order_row, rollup_slot, daily_revenue, top_items, payment_totals
+import metrics
+from history_queries import (
+    InvalidCursor, chat_messages, chat_history_page, iter_chat_history, encode_chat_cursor,
+    order_history_all, order_history_page, iter_order_history,
+)
+from tag_model_handler import (
+    get_final_chat_response, get_final_chat_responses, is_order_query, query_cache, reload_index, retrieval_stats,
+)
 
 app = Flask(__name__)
 
-# Dependency to get DB session
+pool_stats = PoolStats(engine)
+
+# ------------------------------
+# Request metrics
+# ------------------------------
+if PROFILE_SLOW_REQUEST_MS > 0:
+    metrics.enable_profiler(PROFILE_SLOW_REQUEST_MS, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_DIR)
+
+# One engine listener for the process; each request counts on its own thread
+query_counts = ThreadQueryCounts(engine) if QUERY_COUNT_HEADER else None
+request_queries = metrics.registry.histogram(
+    "http_request_db_queries", "SQL statements per request, streamed bodies included.", ("method", "route"),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+) if QUERY_COUNT_HEADER else None
+
+@app.before_request
+def start_request_metrics():
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.start_request(request.method, route)
+    if query_counts is not None:
+        query_counts.start()
+
+@app.after_request
+def record_response_status(response):
+    g.response_status = response.status_code
+    g.response_streamed = response.is_streamed
+    # A streamed body hasn't run yet, so its header would undercount; it is
+    # only recorded in the histogram once the stream finishes
+    if query_counts is not None and not response.is_streamed:
+        response.headers["X-DB-Queries"] = str(query_counts.count)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    # Streamed responses get here once before the body runs and again, inside
+    # stream_with_context, once the stream is consumed; only the last counts
+    if g.pop("response_streamed", False):
+        return
+    metrics.end_request(g.get("response_status"), error=exc is not None)
+    count = query_counts.stop() if query_counts is not None else None
+    if count is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        request_queries.observe(count, request.method, route)
+
+# Request-scoped DB session: opened on first use, closed in teardown
 def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
+    if "db" not in g:
+        db = SessionLocal()
+        start = time.perf_counter()
+        try:
+            # Check a connection out now so time spent waiting on the pool is measured
+            db.connection()
+        except PoolTimeoutError:
+            pool_stats.record_timeout()
+            db.close()
+            raise
+        pool_stats.record_wait(time.perf_counter() - start)
+        g.db = db
+    return g.db
+
+@app.teardown_appcontext
+def close_db(exc):
+    db = g.pop("db", None)
+    if db is not None:
+        if exc is not None:
+            db.rollback()
         db.close()
 
+chat_log_writer = create_chat_log_writer(
+    SessionLocal,
+    max_queue=CHAT_LOG_QUEUE_SIZE,
+    batch_size=CHAT_LOG_BATCH_SIZE,
+    flush_interval_ms=CHAT_LOG_FLUSH_INTERVAL_MS,
+    put_timeout_ms=CHAT_LOG_PUT_TIMEOUT_MS,
+) if CHAT_LOG_WRITE_BEHIND else None
+
+def parse_user_id(value):
+    """user_id as an int (JSON number or digit string), or None if it isn't one."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value if value > 0 else None
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value) or None
+    return None
+
+def valid_restaurant_id(value) -> bool:
+    """restaurant_id is optional; when given it must be an integer."""
+    return value is None or (isinstance(value, int) and not isinstance(value, bool))
+
+def save_chat_history(db, entries):
+    """Store (user_id, question, answer) entries, write-behind when enabled."""
+    now = datetime.datetime.now()
+    with metrics.stage("chat_log"):
+        if chat_log_writer is not None:
+            for user_id, question, answer in entries:
+                chat_log_writer.log(user_id, question, answer, now)
+            return
+        db.add_all([
+            ChatHistory(user_id=user_id, question=question, answer=answer, timestamp=now)
+            for user_id, question, answer in entries
+        ])
+        db.commit()
+
+# ------------------------------
+# Chat admission control
+# ------------------------------
+admission = AdmissionController(
+    user_rate=CHAT_USER_RATE,
+    user_burst=CHAT_USER_BURST,
+    max_in_flight=CHAT_MAX_IN_FLIGHT,
+    order_reserved=CHAT_ORDER_RESERVED,
+    queue_timeout=CHAT_QUEUE_TIMEOUT,
+    max_queue=CHAT_MAX_QUEUE,
+)
+
+def chat_priorities(questions) -> list:
+    # One slot per message, each at its own priority
+    return [PRIORITY_ORDER if is_order_query(q) else PRIORITY_FAQ for q in questions]
+
+def rejected_response(exc: Rejected):
+    message = "Too many messages, slow down" if exc.status == 429 else "Server busy, try again shortly"
+    return jsonify({"error": message}), exc.status, {"Retry-After": exc.retry_after_header}
+
 # -------- CHAT API --------
 @app.route("/chat", methods=["POST"])
 def handle_chat():
     data = request.get_json()
-    user_id = data.get("user_id")
+    user_id = parse_user_id(data.get("user_id"))
     question = data.get("message")
+    restaurant_id = data.get("restaurant_id")
 
     if not user_id or not question:
-        return jsonify({"error": "user_id and message are required"}), 400
+        return jsonify({"error": "an integer user_id and a message are required"}), 400
+    if not valid_restaurant_id(restaurant_id):
+        return jsonify({"error": "restaurant_id must be an integer"}), 400
 
-    db = SessionLocal()
     try:
-        # Generate answer using the tag-based model
-        answer = get_final_chat_response(question, user_id, db)
-
-        # Store in database (without session ID)
-        chat_entry = ChatHistory(
-            user_id=user_id,
-            question=question,
-            answer=answer,
-            timestamp=datetime.datetime.now()
-        )
-        db.add(chat_entry)
-        db.commit()
+        with admission.admit({str(user_id): 1}, chat_priorities([question])):
+            db = get_db()
+            try:
+                # Generate answer using the tag-based model
+                answer, source = get_final_chat_response(question, user_id, db, restaurant_id)
+
+                # Store in database (without session ID)
+                save_chat_history(db, [(user_id, question, answer)])
+
+                return jsonify({
+                    "response": answer,
+                    "source": source
+                })
+
+            except Exception as e:
+                db.rollback()
+                return jsonify({"error": str(e)}), 500
+    except Rejected as e:
+        return rejected_response(e)
+
+# -------- BATCH CHAT API --------
+@app.route("/chat/batch", methods=["POST"])
+def handle_chat_batch():
+    data = request.get_json()
+    messages = data.get("messages") if isinstance(data, dict) else data
+
+    if not isinstance(messages, list) or not messages:
+        return jsonify({"error": "messages must be a non-empty list of {user_id, message}"}), 400
+
+    # A top-level restaurant_id applies to entries that don't name their own
+    default_restaurant_id = data.get("restaurant_id") if isinstance(data, dict) else None
+    pairs = []
+    for entry in messages:
+        user_id = parse_user_id(entry.get("user_id")) if isinstance(entry, dict) else None
+        question = entry.get("message") if isinstance(entry, dict) else None
+        if not user_id or not question:
+            return jsonify({"error": "every entry needs an integer user_id and a message"}), 400
+        restaurant_id = entry.get("restaurant_id", default_restaurant_id)
+        if not valid_restaurant_id(restaurant_id):
+            return jsonify({"error": "restaurant_id must be an integer"}), 400
+        pairs.append((user_id, question, restaurant_id))
+
+    # Each message spends its user's tokens and holds its own slot; a batch
+    # bigger than a user's burst or the slots runs in chunks, later chunks
+    # waiting for tokens rather than being turned away
+    priorities = chat_priorities(question for _, question, _ in pairs)
+    results = []
+    try:
+        for n, (start, end) in enumerate(admission.chunks([user_id for user_id, _, _ in pairs], priorities)):
+            costs = {}
+            for user_id, _, _ in pairs[start:end]:
+                costs[str(user_id)] = costs.get(str(user_id), 0) + 1
+            with admission.admit(costs, priorities[start:end], pace=n > 0):
+                db = get_db()
+                try:
+                    results.extend(get_final_chat_responses(pairs[start:end], db))
+                except Exception as e:
+                    db.rollback()
+                    return jsonify({"error": str(e)}), 500
+
+        try:
+            save_chat_history(db, [
+                (user_id, question, answer)
+                for (user_id, question, _), (answer, _) in zip(pairs, results)
+            ])
+        except Exception as e:
+            db.rollback()
+            return jsonify({"error": str(e)}), 500
 
         return jsonify({
-            "response": answer
+            "responses": [
+                {"user_id": user_id, "response": answer, "source": source}
+                for (user_id, _, _), (answer, source) in zip(pairs, results)
+            ]
         })
-
-    except Exception as e:
-        db.rollback()
-        return jsonify({"error": str(e)}), 500
-    finally:
-        db.close()
+    except Rejected as e:
+        return rejected_response(e)
 
 # ------------------------------
 # Basic Routes
@@ -64,7 +262,7 @@ def root():
 @app.route("/users", methods=["POST"])
 def create_user():
     data = request.get_json()
-    db = next(get_db())
+    db = get_db()
     try:
         existing_user = db.query(User).filter(
             (User.contact == data["contact"]) | (User.email == data["email"])
@@ -89,24 +287,71 @@ def create_user():
         db.rollback()
         return jsonify({"error": str(e)}), 500
 
+# ------------------------------
+# Cached reference responses
+#
+# /menu and /restaurant/info are served from the reference snapshot and
+# rendered once per snapshot version; clients revalidate with the strong
+# ETag and get 304 while nothing has changed.
+# ------------------------------
+response_cache = ResponseCache(maxsize=RESPONSE_CACHE_SIZE)
+
+# Reference rows committed through this app's sessions take effect at once
+# (a new snapshot version re-keys the cached responses); other writers wait
+# out REFERENCE_DATA_TTL or call /admin/reference_data/invalidate
+track_reference_writes(SessionLocal, invalidate_menu)
+
+MENU_FIELDS = ("id", "name", "description", "category", "price")
+RESTAURANT_FIELDS = (
+    "name", "address", "contact", "email", "wifi", "parking",
+    "opening_hours", "closing_time", "weekend_hours", "delivery_time", "capacity",
+)
+
+def reference_snapshot(restaurant_id=None):
+    # A fresh snapshot needs no DB session at all
+    return peek_snapshot(restaurant_id) or get_snapshot(get_db(), restaurant_id)
+
+def cached_json_response(key, render, restaurant_id=None):
+    """Serve ``render(snapshot)`` -> (payload, status) from the response cache, honouring If-None-Match."""
+    snapshot = reference_snapshot(restaurant_id)
+
+    def render_body():
+        payload, status = render(snapshot)
+        return app.json.dumps(payload, separators=(",", ":")).encode("utf-8"), status
+
+    cached = response_cache.get(key, snapshot.version, render_body)
+    if cached.status == 200 and request.if_none_match.contains(cached.etag):
+        response = Response(status=304)
+    else:
+        response = Response(cached.body, status=cached.status, mimetype="application/json")
+    response.set_etag(cached.etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def split_param(name):
+    value = request.args.get(name, "")
+    return tuple(sorted({part.strip().lower() for part in value.split(",") if part.strip()}))
+
 # ------------------------------
 # Get All Menu Items
 # ------------------------------
 @app.route("/menu", methods=["GET"])
 def get_menu():
-    db = next(get_db())
-    items = db.query(MenuItem).all()
-    result = [
-        {
-            "id": item.id,
-            "name": item.name,
-            "description": item.description,
-            "category": item.category,
-            "price": item.price,
-        }
-        for item in items
-    ]
-    return jsonify(result)
+    """Menu items, optionally ?category=a,b (case-insensitive) and ?fields=id,name,..."""
+    categories = split_param("category")
+    fields = split_param("fields")
+    unknown = [f for f in fields if f not in MENU_FIELDS]
+    if unknown:
+        return jsonify({"error": f"unknown fields: {', '.join(unknown)}", "allowed": list(MENU_FIELDS)}), 400
+    fields = tuple(f for f in MENU_FIELDS if f in fields) or MENU_FIELDS
+
+    def render(snapshot):
+        items = snapshot.menu
+        if categories:
+            items = [item for item in items if (item["category"] or "").lower() in categories]
+        return [{field: item[field] for field in fields} for item in items], 200
+
+    return cached_json_response(("menu", categories, fields), render)
 
 # ------------------------------
 # Place Order
@@ -114,10 +359,12 @@ def get_menu():
 @app.route("/order", methods=["POST"])
 def place_order():
     data = request.get_json()
-    db = next(get_db())
+    db = get_db()
     try:
         order = Order(
             user_id=data["user_id"],
+            # Set here rather than by the DB so the sales rollup gets the same day
+            order_time=datetime.datetime.now(),
             total_amount=data["total_amount"],
             payment_method=data.get("payment_method"),
             delivery_address=data.get("delivery_address"),
@@ -134,6 +381,10 @@ def place_order():
                 price_per_unit=item["price_per_unit"],
                 customization=item.get("customization", "")
             ))
+        record_orders(db, [order_row(
+            order.order_time, order.total_amount, order.payment_method,
+            [(item["menu_item_id"], item["quantity"], item["price_per_unit"]) for item in data["items"]],
+        )], rollup_slot(order.id))
 
         db.commit()
         return jsonify({"message": "Order placed", "order_id": order.id}), 201
@@ -141,96 +392,303 @@ def place_order():
         db.rollback()
         return jsonify({"error": str(e)}), 500
 
+# ------------------------------
+# Bulk Order Import
+# JSON body ({"orders": [...]} or a list) or a JSON Lines stream
+# (Content-Type: application/x-ndjson), one order per line
+# ------------------------------
+JSONL_MIMETYPES = {"application/x-ndjson", "application/jsonl", "application/x-jsonlines"}
+
+@app.route("/orders/bulk", methods=["POST"])
+def bulk_import_orders():
+    chunk_size = request.args.get("chunk_size", BULK_ORDER_CHUNK_SIZE, type=int)
+    db = get_db()
+    try:
+        if request.mimetype in JSONL_MIMETYPES:
+            orders = iter_jsonl_orders(request.stream)
+        else:
+            data = request.get_json(silent=True)
+            if data is None:
+                return jsonify({"error": "expected a JSON body or a JSON Lines stream"}), 400
+            orders = iter_json_orders(data)
+
+        report = ingest_orders(db, orders, chunk_size)
+        return jsonify(report), 201 if report["created"] else 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except SQLAlchemyError as e:
+        db.rollback()
+        return jsonify({"error": str(e)}), 500
+
+# ------------------------------
+# History helpers
+# ------------------------------
+def wants_stream() -> bool:
+    return request.args.get("stream", "").lower() in ("1", "true", "yes")
+
+def stream_json_array(rows, to_items):
+    """Write a JSON array one element at a time so memory stays flat for long histories.
+
+    stream_with_context keeps the request (and its DB session) open until the
+    last chunk is sent; teardown closes the session afterwards.
+    """
+    def generate():
+        yield "["
+        first = True
+        for row in rows:
+            for item in to_items(row):
+                yield ("" if first else ",") + json.dumps(item)
+                first = False
+        yield "]"
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
 # ------------------------------
 # Get Full Chat History (no session)
+# Optional: ?limit=&before=&after= for keyset pages, ?stream=1 to stream
 # ------------------------------
 @app.route("/chat_history/<int:user_id>", methods=["GET"])
 def get_full_chat_history(user_id):
-    db = SessionLocal()
+    limit = request.args.get("limit", type=int)
+    before = request.args.get("before")
+    after = request.args.get("after")
+
+    db = get_db()
     try:
-        history = db.query(ChatHistory).filter(
-            ChatHistory.user_id == user_id
-        ).order_by(ChatHistory.timestamp.asc()).all()
-
-        response = []
-        for chat in history:
-            response.append({
-                "sender": "user",
-                "text": chat.question,
-                "timestamp": chat.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            })
-            response.append({
-                "sender": "bot",
-                "text": chat.answer,
-                "timestamp": chat.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            })
-
-        return jsonify(response)
+        if wants_stream():
+            rows = iter_chat_history(db, user_id, before, after)
+            return stream_json_array(rows, chat_messages)
+
+        if limit is None and not before and not after:
+            history = db.query(ChatHistory).filter(
+                ChatHistory.user_id == user_id
+            ).order_by(ChatHistory.timestamp.asc(), ChatHistory.id.asc()).all()
+            return jsonify([message for chat in history for message in chat_messages(chat)])
+
+        rows, has_more = chat_history_page(db, user_id, limit, before, after)
+        return jsonify({
+            "items": [message for chat in rows for message in chat_messages(chat)],
+            "has_more": has_more,
+            "before": encode_chat_cursor(rows[0]) if rows else None,
+            "after": encode_chat_cursor(rows[-1]) if rows else None,
+        })
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        db.close()
 
 # ------------------------------
 # Get Restaurant Info
 # ------------------------------
 @app.route("/restaurant/info", methods=["GET"])
 def get_restaurant_info():
-    db = next(get_db())
-    info = db.query(RestaurantInfo).first()
-    if info:
-        return jsonify({
-            "name": info.name,
-            "address": info.address,
-            "contact": info.contact,
-            "email": info.email,
-            "wifi": info.wifi,
-            "parking": info.parking,
-            "opening_hours": info.opening_hours,
-            "closing_time": info.closing_time,
-            "weekend_hours": info.weekend_hours,
-            "delivery_time": info.delivery_time,
-            "capacity": info.capacity,
-        })
-    return jsonify({"message": "No restaurant info found"}), 404
+    """The restaurant row for ?restaurant_id=N, or the first one when it's omitted."""
+    restaurant_id = request.args.get("restaurant_id", type=int)
+    if restaurant_id is None and "restaurant_id" in request.args:
+        return jsonify({"error": "restaurant_id must be an integer"}), 400
+
+    def render(snapshot):
+        info = snapshot.restaurant
+        if info:
+            return {field: info[field] for field in RESTAURANT_FIELDS}, 200
+        return {"message": "No restaurant info found"}, 404
+
+    return cached_json_response(("restaurant_info", restaurant_id), render, restaurant_id)
+
+# ------------------------------
+# Order History
+# Optional: ?limit=&before=&after= (order ids) for keyset pages, ?stream=1 to stream
+# ------------------------------
 @app.route("/order_history/<int:user_id>", methods=["GET"])
 def get_order_history(user_id):
-    db = SessionLocal()
+    limit = request.args.get("limit", type=int)
+    before = request.args.get("before")
+    after = request.args.get("after")
+
+    db = get_db()
     try:
-        orders = db.query(Order).filter(Order.user_id == user_id).order_by(Order.id.desc()).all()
-
-        history = []
-        for order in orders:
-            items = []
-            for item in order.items:
-                items.append({
-                    "item_name": item.menu_item.name if item.menu_item else "Unknown",
-                    "quantity": item.quantity,
-                    "price_per_unit": item.price_per_unit,
-                    "customization": item.customization
-                })
+        if wants_stream():
+            rows = iter_order_history(db, user_id, before, after)
+            return stream_json_array(rows, lambda order: [order])
 
-            history.append({
-                "order_id": order.id,
-                "total_amount": order.total_amount,
-                "payment_method": order.payment_method,
-                "delivery_address": order.delivery_address,
-                "special_instructions": order.special_instructions,
-                "timestamp": order.order_time.strftime("%Y-%m-%d %H:%M:%S"),
-                "items": items
-            })
+        if limit is None and not before and not after:
+            return jsonify(order_history_all(db, user_id)), 200
 
-        return jsonify(history), 200
+        orders, has_more = order_history_page(db, user_id, limit, before, after)
+        return jsonify({
+            "items": orders,
+            "has_more": has_more,
+            "before": str(orders[-1]["order_id"]) if orders else None,
+            "after": str(orders[0]["order_id"]) if orders else None,
+        }), 200
 
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         db.rollback()
         return jsonify({"error": str(e)}), 500
-    finally:
-        db.close()
+
+# ------------------------------
+# Analytics (served from the sales rollup tables only)
+# ------------------------------
+ANALYTICS_DEFAULT_DAYS = 7
+
+def analytics_range():
+    """(start, end) dates from ?start=YYYY-MM-DD&end=YYYY-MM-DD, inclusive; defaults to the last week."""
+    end = request.args.get("end")
+    start = request.args.get("start")
+    end = datetime.date.fromisoformat(end) if end else datetime.date.today()
+    start = datetime.date.fromisoformat(start) if start else end - datetime.timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    if start > end:
+        raise ValueError("start must not be after end")
+    return start, end
+
+@app.route("/analytics/revenue/daily", methods=["GET"])
+def analytics_daily_revenue():
+    try:
+        start, end = analytics_range()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        days = daily_revenue(get_db(), start, end)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "orders": sum(d["orders"] for d in days),
+        "revenue": round(sum(d["revenue"] for d in days), 2),
+        "days": days,
+    })
+
+@app.route("/analytics/items/top", methods=["GET"])
+def analytics_top_items():
+    try:
+        start, end = analytics_range()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    by = request.args.get("by", "quantity")
+    if by not in ("quantity", "revenue"):
+        return jsonify({"error": "by must be quantity or revenue"}), 400
+    limit = max(1, min(request.args.get("limit", 10, type=int), 100))
+
+    try:
+        rows = top_items(get_db(), start, end, by, limit)
+        # Names come from the reference snapshot, not a join
+        names = {item["id"]: item["name"] for item in reference_snapshot().menu}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "by": by,
+        "items": [
+            {"menu_item_id": menu_item_id, "name": names.get(menu_item_id, "Unknown"),
+             "quantity": int(quantity), "revenue": round(revenue, 2)}
+            for menu_item_id, quantity, revenue in rows
+        ],
+    })
+
+@app.route("/analytics/payment_methods", methods=["GET"])
+def analytics_payment_methods():
+    try:
+        start, end = analytics_range()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        methods = payment_totals(get_db(), start, end)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "payment_methods": methods,
+    })
+
+# ------------------------------
+# Admin: retrieval index and query cache
+# ------------------------------
+@app.route("/admin/reload_index", methods=["POST"])
+def admin_reload_index():
+    try:
+        reload_index()
+        return jsonify({"message": "Index reloaded", "query_cache": query_cache.stats()}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/admin/query_cache", methods=["GET"])
+def admin_query_cache():
+    return jsonify(query_cache.stats())
+
+@app.route("/admin/pool", methods=["GET"])
+def admin_pool_stats():
+    return jsonify(pool_stats.snapshot())
+
+@app.route("/admin/chat_log", methods=["GET"])
+def admin_chat_log_stats():
+    if chat_log_writer is None:
+        return jsonify({"write_behind": False})
+    return jsonify({"write_behind": True, **chat_log_writer.stats()})
+
+@app.route("/admin/startup", methods=["GET"])
+def admin_startup_report():
+    return jsonify(runtime.startup_report())
+
+@app.route("/admin/reference_data/invalidate", methods=["POST"])
+def admin_invalidate_reference_data():
+    """Call after editing menu or restaurant rows so every cache picks up the change."""
+    invalidate_reference_data()
+    invalidate_menu()
+    response_cache.invalidate()
+    return jsonify({"message": "Reference data invalidated"})
+
+@app.route("/admin/response_cache", methods=["GET"])
+def admin_response_cache():
+    return jsonify(response_cache.stats())
+
+@app.route("/admin/admission", methods=["GET"])
+def admin_admission_stats():
+    return jsonify(admission.stats())
+
+@app.route("/admin/shards", methods=["GET"])
+def admin_shard_stats():
+    return jsonify(runtime.shards.stats())
+
+@app.route("/admin/retrieval", methods=["GET"])
+def admin_retrieval_stats():
+    return jsonify(retrieval_stats())
+
+# ------------------------------
+# Metrics
+# ------------------------------
+metrics.registry.gauge("db_pool_checked_out", "Connections currently checked out of the pool.",
+                       lambda: pool_stats.snapshot().get("checkedout"))
+metrics.registry.gauge("query_cache_entries", "Entries in the semantic query cache.",
+                       lambda: query_cache.stats()["size"])
+metrics.registry.gauge("query_cache_hit_ratio", "Query cache hit rate since start.",
+                       lambda: query_cache.stats()["hit_rate"])
+metrics.registry.gauge("chat_in_flight", "Chat requests holding an admission slot.",
+                       lambda: admission.in_flight)
+metrics.registry.gauge("chat_admission_waiting", "Chat requests waiting for an admission slot.",
+                       lambda: {(p,): n for p, n in admission.stats()["waiting"].items()}, ("priority",))
+if chat_log_writer is not None:
+    metrics.registry.gauge("chat_log_queue_depth", "Chat log entries waiting to be written.",
+                           lambda: chat_log_writer.stats()["queue_depth"])
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/admin/slow_requests", methods=["GET"])
+def admin_slow_requests():
+    if metrics.profiler is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **metrics.profiler.stats()})
 
 
 # ------------------------------
 # Run the app
 # ------------------------------
 if __name__ == "__main__":
+    if PRELOAD_MODEL:
+        print("Model preloaded:", json.dumps(preload()))
     app.run(host="127.0.0.1", debug=True)
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import sys
+import tempfile
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from Resturant_Project.config import (
+    PRELOAD_MODEL, ASYNC_MAX_CONCURRENCY, ASYNC_QUEUE_TIMEOUT, ASYNC_REQUEST_WORKERS,
+)
+from app import app as flask_app, chat_log_writer
+from model_runtime import preload
+
+# Request bodies bigger than this spill from memory to a temp file
+MAX_MEMORY_BODY = 1024 * 1024
+
+
+class AsyncStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.served = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.queue_wait_total += seconds
+            self.queue_wait_max = max(self.queue_wait_max, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            admitted = self.served + self.in_flight
+            return {
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "served": self.served,
+                "rejected": self.rejected,
+                "queue_wait_avg_ms": round(self.queue_wait_total / admitted * 1000, 3) if admitted else 0.0,
+                "queue_wait_max_ms": round(self.queue_wait_max * 1000, 3),
+            }
+
+
+class AsyncApp:
+    """ASGI front end for the Flask app.
+
+    The event loop only accepts connections and shuttles bytes; route handlers
+    (DB queries, model lookups) run on a bounded thread pool. At most
+    ``max_concurrency`` requests are handled at once, and a request that
+    can't get a slot within ``queue_timeout`` seconds gets a 503 with
+    Retry-After instead of queueing without bound.
+    """
+
+    def __init__(self, wsgi_app, max_concurrency=ASYNC_MAX_CONCURRENCY,
+                 queue_timeout=ASYNC_QUEUE_TIMEOUT, workers=ASYNC_REQUEST_WORKERS):
+        self.wsgi_app = wsgi_app
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.queue_timeout = float(queue_timeout)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="request")
+        self.stats = AsyncStats()
+        # Created lazily so it binds to the server's event loop
+        self._slots = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            if scope["path"] == "/admin/async":
+                await self._send_json(send, 200, self.snapshot())
+                return
+            await self._handle(scope, receive, send)
+
+    def snapshot(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queue_timeout_s": self.queue_timeout,
+            "request_workers": self.executor._max_workers,
+            **self.stats.snapshot(),
+        }
+
+    # ------------------------------
+    # Lifespan
+    # ------------------------------
+    async def _lifespan(self, receive, send):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                if PRELOAD_MODEL:
+                    report = await loop.run_in_executor(self.executor, preload)
+                    print("Model preloaded:", json.dumps(report))
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=True)
+                if chat_log_writer is not None:
+                    chat_log_writer.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # ------------------------------
+    # Requests
+    # ------------------------------
+    async def _acquire(self) -> bool:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        start = time.perf_counter()
+        self.stats.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.stats.waiting -= 1
+        self.stats.record_wait(time.perf_counter() - start)
+        return True
+
+    async def _handle(self, scope, receive, send):
+        if not await self._acquire():
+            self.stats.rejected += 1
+            retry_after = str(max(1, int(round(self.queue_timeout))))
+            await self._send_json(send, 503, {"error": "Server busy, try again shortly"},
+                                  [(b"retry-after", retry_after.encode("ascii"))])
+            return
+
+        self.stats.in_flight += 1
+        body = tempfile.SpooledTemporaryFile(max_size=MAX_MEMORY_BODY)
+        try:
+            await self._read_body(receive, body)
+            await self._run_wsgi(scope, body, send)
+        finally:
+            body.close()
+            self.stats.in_flight -= 1
+            self.stats.served += 1
+            self._slots.release()
+
+    @staticmethod
+    async def _read_body(receive, body):
+        more = True
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            body.write(message.get("body", b""))
+            more = message.get("more_body", False)
+        body.seek(0)
+
+    async def _run_wsgi(self, scope, body, send):
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, body)
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+        def call_app():
+            result = self.wsgi_app(environ, start_response)
+            return result, iter(result)
+
+        result, chunks = await loop.run_in_executor(self.executor, call_app)
+        try:
+            # Streaming routes produce chunks lazily, each pulled on the pool
+            first = await loop.run_in_executor(self.executor, next, chunks, None)
+            await send({"type": "http.response.start", "status": response["status"], "headers": response["headers"]})
+            chunk = first
+            while chunk is not None:
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            # Runs Flask's teardown, which returns the request's DB session
+            if hasattr(result, "close"):
+                await loop.run_in_executor(self.executor, result.close)
+
+    @staticmethod
+    async def _send_json(send, status, payload, extra_headers=()):
+        body = json.dumps(payload).encode("utf-8")
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("ascii"))]
+        await send({"type": "http.response.start", "status": status, "headers": headers + list(extra_headers)})
+        await send({"type": "http.response.body", "body": body})
+
+
+def build_environ(scope, body) -> dict:
+    """WSGI environ for an ASGI http scope."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]) if server[1] is not None else "80",
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        # The whole body is already spooled, so chunked uploads can be read to EOF
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name == "CONTENT_LENGTH":
+            environ["CONTENT_LENGTH"] = value
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+app = AsyncApp(flask_app)
+
+
+# ------------------------------
+# Run the app
+# ------------------------------
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("asgi:app", host="127.0.0.1", port=8000)
@@ -0,0 +1,25 @@
+"""Import setup shared by the benchmark scripts.
+
+The app modules import ``Resturant_Project.config``, the name the checkout
+has when deployed. ``setup_imports`` puts the checkout on sys.path and
+exposes it under that name through a symlink in a temporary directory, so
+the scripts run as ``python benchmarks/<script>.py`` from any checkout.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_imports(prefix="bench-") -> str:
+    """Make the app modules importable; returns the directory holding the alias."""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    os.symlink(ROOT, os.path.join(workdir, "Resturant_Project"))
+    sys.path.insert(0, workdir)
+    # config builds an engine at import; keep it off MySQL (scripts that
+    # need a database make their own)
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    return workdir
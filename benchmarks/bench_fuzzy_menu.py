@@ -0,0 +1,78 @@
+"""Time the fuzzy "did you mean" index on large synthetic menus.
+
+Each query is a menu name with one or two typos (dropped, swapped or
+replaced letters), scored the way parse_with_suggestions does it: all of a
+message's missing phrases against the whole menu in one call.
+
+    python benchmarks/bench_fuzzy_menu.py --sizes 1000 10000 50000
+"""
+import argparse
+import random
+import time
+
+from bench_env import setup_imports
+
+setup_imports()
+from Resturant_Project.config import FUZZY_AUTOCORRECT_SCORE
+from menu_matcher import FuzzyMenuIndex
+from bench_menu_matcher import synthetic_menu
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def typo(name, rng, edits):
+    chars = list(name.lower())
+    for _ in range(edits):
+        i = rng.randrange(len(chars))
+        kind = rng.choice(("drop", "swap", "replace"))
+        if kind == "drop" and len(chars) > 3:
+            del chars[i]
+        elif kind == "swap" and i + 1 < len(chars):
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        else:
+            chars[i] = rng.choice(LETTERS)
+    return "".join(chars)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--phrases-per-message", type=int, default=2)
+    parser.add_argument("--edits", type=int, default=1, help="typos per phrase")
+    args = parser.parse_args()
+
+    print(f"{'menu size':>10} {'build ms':>10} {'us/message':>11} {'us/phrase':>10} {'top1':>6} {'autocorrect':>12}")
+    for size in args.sizes:
+        menu = synthetic_menu(size)
+        names = [item["name"] for item in menu]
+        rng = random.Random(size)
+        messages = []
+        for _ in range(args.messages):
+            picks = rng.sample(range(size), args.phrases_per_message)
+            messages.append((picks, [typo(names[pos], rng, args.edits) for pos in picks]))
+
+        start = time.perf_counter()
+        index = FuzzyMenuIndex(names)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        index.top(messages[0][1])  # warm up
+        start = time.perf_counter()
+        results = [index.top(phrases) for _, phrases in messages]
+        elapsed = time.perf_counter() - start
+
+        total = hits = corrected = 0
+        for (picks, _), ranked_per_phrase in zip(messages, results):
+            for expected, ranked in zip(picks, ranked_per_phrase):
+                total += 1
+                if ranked and names[ranked[0][0]] == names[expected]:
+                    hits += 1
+                    corrected += ranked[0][1] >= FUZZY_AUTOCORRECT_SCORE
+
+        per_message = elapsed / len(messages) * 1e6
+        print(f"{size:>10} {build_ms:>10.1f} {per_message:>11.1f} {per_message / args.phrases_per_message:>10.1f} "
+              f"{hits / total:>6.1%} {corrected / total:>12.1%}")
+
+
+if __name__ == "__main__":
+    main()
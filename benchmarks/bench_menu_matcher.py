@@ -0,0 +1,97 @@
+"""Compare the old per-message menu scan with the compiled MenuMatcher.
+
+    python benchmarks/bench_menu_matcher.py --sizes 100 1000 10000
+"""
+import argparse
+import random
+import re
+import time
+
+from bench_env import setup_imports
+
+setup_imports()
+from menu_matcher import MenuMatcher, STOPWORDS
+
+WORDS = (
+    "chicken beef paneer veggie spicy grilled crispy garlic cheese masala tikka karahi "
+    "biryani pulao burger wrap salad soup fries shake tea coffee lassi naan roll pizza "
+    "pasta sandwich brownie cake kulfi mango lemon mint smoked bbq peri classic special"
+).split()
+
+
+def synthetic_menu(size, seed=0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < size:
+        names.add(" ".join(rng.sample(WORDS, rng.randint(1, 4))))
+    return [{"id": i + 1, "name": name.title(), "price": float(rng.randint(100, 2000))}
+            for i, name in enumerate(sorted(names))]
+
+
+def synthetic_queries(menu, count, seed=1):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        picks = rng.sample(menu, min(3, len(menu)))
+        parts = [f"{rng.randint(1, 4)} {item['name'].lower()}" for item in picks]
+        queries.append("i want " + ", ".join(parts) + " and a unicorn steak please")
+    return queries
+
+
+def legacy_parse(query, menu_items):
+    # parse_order_query before the matcher, minus the DB round trip
+    query = query.lower()
+    item_map = {item["name"].lower(): item for item in menu_items}
+    all_item_names = list(item_map.keys())
+    valid_items, missing_items, already_added = [], [], set()
+    for quantity_str, raw_item_name in re.findall(r"(\d+)?\s*([a-zA-Z ]+)", query):
+        filtered_words = [w for w in raw_item_name.strip().lower().split() if w not in STOPWORDS]
+        if not filtered_words:
+            continue
+        cleaned_item_name = ' '.join(filtered_words)
+        quantity = int(quantity_str) if quantity_str else 1
+        matched = None
+        for name in all_item_names:
+            if name in cleaned_item_name and name not in already_added:
+                matched = name
+                break
+        if matched:
+            item = item_map[matched]
+            valid_items.append({"menu_item_id": item["id"], "name": item["name"],
+                                "quantity": quantity, "price_per_unit": item["price"]})
+            already_added.add(matched)
+        elif cleaned_item_name not in already_added and len(cleaned_item_name) > 2:
+            missing_items.append(cleaned_item_name)
+            already_added.add(cleaned_item_name)
+    return valid_items, missing_items
+
+
+def per_call_us(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'menu size':>10} {'build ms':>10} {'legacy us/msg':>15} {'matcher us/msg':>15} {'speedup':>8}")
+    for size in args.sizes:
+        menu = synthetic_menu(size)
+        queries = synthetic_queries(menu, args.queries)
+
+        start = time.perf_counter()
+        matcher = MenuMatcher(menu)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        legacy = per_call_us(lambda q: legacy_parse(q, menu), queries)
+        compiled = per_call_us(matcher.parse, queries)
+        print(f"{size:>10} {build_ms:>10.1f} {legacy:>15.1f} {compiled:>15.1f} {legacy / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
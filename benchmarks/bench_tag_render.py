@@ -0,0 +1,74 @@
+"""Compare the old findall + str.replace tag loop with precompiled templates.
+
+    python benchmarks/bench_tag_render.py --menu-size 500
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from answer_templates import AnswerTemplate
+
+
+def tag_values(menu_size, policy_count):
+    menu = "\n".join(f"🍽 Item {i} - Rs {100 + i}" for i in range(menu_size))
+    policy = "\n".join(f"Policy {i}: Value {i}" for i in range(policy_count))
+    return {
+        "menuitem": menu, "policy": policy, "name": "Bistro", "location": "📍 Bistro, Main St",
+        "contact": "📞 0300", "wifi": "✅ Available", "parking": "❌ Not Available",
+    }
+
+
+ANSWERS = {
+    "menu": "Here is our menu:\n<menuitem>\nAsk <name> staff at <location> or call <contact>.",
+    "policy": "<name> policies:\n<policy>\nWifi: <wifi>, Parking: <parking>. Questions? <contact>",
+    "repeated": " ".join(["<name> at <location>, wifi <wifi>."] * 20),
+}
+
+
+def legacy_render(response, resolve):
+    # replace_tags_with_db_data before templates: one resolve and one rescan per occurrence
+    for tag in re.findall(r"<(.*?)>", response):
+        response = response.replace(f"<{tag}>", resolve(tag))
+    return response
+
+
+def per_call_us(fn, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--menu-size", type=int, default=500)
+    parser.add_argument("--policies", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    values = tag_values(args.menu_size, args.policies)
+    calls = {"n": 0}
+
+    def resolve(tag):
+        calls["n"] += 1
+        return values.get(tag, f"<{tag}>")
+
+    print(f"{'answer':>10} {'legacy us':>10} {'template us':>12} {'speedup':>8} {'resolves legacy/template':>26}")
+    for label, text in ANSWERS.items():
+        template = AnswerTemplate(text)
+        assert template.render(resolve) == legacy_render(text, resolve)
+
+        calls["n"] = 0
+        legacy = per_call_us(lambda: legacy_render(text, resolve), args.runs)
+        legacy_calls = calls["n"] // args.runs
+        calls["n"] = 0
+        compiled = per_call_us(lambda: template.render(resolve), args.runs)
+        compiled_calls = calls["n"] // args.runs
+        print(f"{label:>10} {legacy:>10.1f} {compiled:>12.1f} {legacy / compiled:>7.1f}x {legacy_calls:>15}/{compiled_calls}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Query-count regression check for the history endpoints, on a SQLite stand-in.
+
+Seeds a throwaway SQLite database and fails (non-zero exit) if any history
+path issues more statements than its budget, e.g. when an N+1 lazy load
+creeps back in.
+
+    python benchmarks/check_query_counts.py --orders 300 --items-per-order 4
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.model import Base, User, MenuItem, Order, OrderItem, ChatHistory
+from database.query_counter import assert_max_queries
+from history_queries import (
+    order_history_all, order_history_page, iter_order_history,
+    chat_history_page, iter_chat_history,
+)
+
+
+def seed(db, orders, items_per_order, chats, seed_value=0):
+    rng = random.Random(seed_value)
+    db.add(User(id=1, name="Regular", contact="0300", email="regular@example.com"))
+    menu = [MenuItem(id=i + 1, name=f"Item {i}", price=float(100 + i)) for i in range(50)]
+    db.add_all(menu)
+    db.flush()
+    start = datetime.datetime(2024, 1, 1)
+    for n in range(orders):
+        order = Order(id=n + 1, user_id=1, total_amount=0.0, order_time=start + datetime.timedelta(minutes=n))
+        db.add(order)
+        for _ in range(items_per_order):
+            item = rng.choice(menu)
+            db.add(OrderItem(order_id=order.id, menu_item_id=item.id, quantity=1, price_per_unit=item.price))
+    for n in range(chats):
+        db.add(ChatHistory(user_id=1, question=f"q{n}", answer=f"a{n}",
+                           timestamp=start + datetime.timedelta(seconds=n // 3)))
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--items-per-order", type=int, default=4)
+    parser.add_argument("--chats", type=int, default=1000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    seed(Session(), args.orders, args.items_per_order, args.chats)
+
+    # (label, budget, callable run in a fresh session)
+    checks = [
+        ("order history (full)", 1, lambda db: order_history_all(db, 1)),
+        ("order history (page)", 1, lambda db: order_history_page(db, 1, limit=50, before="200")),
+        ("order history (stream)", 1, lambda db: list(iter_order_history(db, 1))),
+        ("chat history (page)", 1, lambda db: chat_history_page(db, 1, limit=50)),
+        ("chat history (stream)", 1, lambda db: list(iter_chat_history(db, 1))),
+    ]
+
+    failed = False
+    for label, budget, run in checks:
+        db = Session()
+        try:
+            with assert_max_queries(engine, budget, label) as counter:
+                run(db)
+            print(f"ok    {label}: {counter.count} queries (budget {budget})")
+        except AssertionError as e:
+            failed = True
+            print(f"FAIL  {str(e).splitlines()[0]}")
+        finally:
+            db.close()
+
+    # Sanity-check the page contents, not just the count
+    db = Session()
+    orders, has_more = order_history_page(db, 1, limit=50, before="200")
+    assert [o["order_id"] for o in orders] == list(range(199, 149, -1)) and has_more
+    assert all(len(o["items"]) == args.items_per_order for o in orders)
+    db.close()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Query-plan regression check for the hot per-user lookups, on a SQLite stand-in.
+
+Seeds a SQLite file with millions of chat and order rows but no secondary
+indexes (like a database created before they were declared), runs the
+index migration, then captures the SQL the app actually issues and fails
+(non-zero exit) unless EXPLAIN QUERY PLAN shows each one using its index
+without a temp B-tree sort. Timings before and after the migration are
+printed for comparison.
+
+    python benchmarks/check_query_plans.py --chats 2000000 --orders 1000000
+    python benchmarks/check_query_plans.py --chats 200000 --orders 100000   # quick run
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bench_env import setup_imports
+
+setup_imports()
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.model import Base, User, MenuItem
+from database.migrate_indexes import ensure_indexes
+from database.query_counter import QueryCounter
+from history_queries import chat_history_page, order_history_page, encode_chat_cursor
+from tag_model_handler import latest_order_total, latest_order_totals
+
+CHUNK = 50_000
+
+
+def seed(engine, users, chats, orders, items_per_order, seed_value=0):
+    """Bulk-load rows through the raw DB-API connection, in user-interleaved order."""
+    rng = random.Random(seed_value)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add_all([User(id=i, name=f"user{i}", contact=f"0300{i:07d}", email=f"u{i}@example.com")
+                for i in range(1, users + 1)])
+    db.add_all([MenuItem(id=i, name=f"Item {i}", price=float(100 + i)) for i in range(1, 51)])
+    db.commit()
+    db.close()
+
+    start = datetime.datetime(2024, 1, 1)
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("PRAGMA journal_mode=OFF")
+        cur.execute("PRAGMA synchronous=OFF")
+
+        def stamp(seconds):
+            return (start + datetime.timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+        for lo in range(0, chats, CHUNK):
+            cur.executemany(
+                "INSERT INTO chat_history (user_id, question, answer, timestamp) VALUES (?, ?, ?, ?)",
+                [(rng.randint(1, users), f"q{n}", f"a{n}", stamp(n)) for n in range(lo, min(lo + CHUNK, chats))],
+            )
+        for lo in range(0, orders, CHUNK):
+            hi = min(lo + CHUNK, orders)
+            cur.executemany(
+                'INSERT INTO "order" (id, user_id, status, order_time, total_amount, payment_method, '
+                "delivery_address, special_instructions) VALUES (?, ?, 'Paid', ?, ?, 'cash', '', '')",
+                [(n + 1, rng.randint(1, users), stamp(n * 7), float(rng.randint(100, 5000))) for n in range(lo, hi)],
+            )
+            cur.executemany(
+                "INSERT INTO order_item (order_id, menu_item_id, quantity, price_per_unit, customization) "
+                "VALUES (?, ?, 1, 100.0, '')",
+                [(n + 1, rng.randint(1, 50)) for n in range(lo, hi) for _ in range(items_per_order)],
+            )
+        raw.commit()
+        cur.execute("ANALYZE")
+    finally:
+        raw.close()
+
+
+def capture(engine, run):
+    """Run ``run(db)`` and return (seconds, [(statement, parameters)]) for what it sent."""
+    db = sessionmaker(bind=engine)()
+    try:
+        with QueryCounter(engine) as counter:
+            start = time.perf_counter()
+            run(db)
+            elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+    return elapsed, list(zip(counter.statements, counter.parameters))
+
+
+def explain(engine, statement, parameters) -> list:
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [row[-1] for row in cur.fetchall()]
+    finally:
+        raw.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--chats", type=int, default=2_000_000)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--items-per-order", type=int, default=2)
+    parser.add_argument("--db", help="SQLite file to use (default: a temp file, deleted afterwards)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "plans.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    # Start from a pre-index schema so the migration path is what adds them
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{index.name}"')
+
+    start = time.perf_counter()
+    seed(engine, args.users, args.chats, args.orders, args.items_per_order)
+    print(f"seeded {args.chats} chats, {args.orders} orders in {time.perf_counter() - start:.1f}s ({path})")
+
+    user_id = args.users // 2
+    probe = sessionmaker(bind=engine)()
+    first_page, _ = chat_history_page(probe, user_id, limit=50)
+    cursor = encode_chat_cursor(first_page[-1]) if first_page else None
+    probe.close()
+
+    # (label, index the plan must use, whether ORDER BY must come from it, callable issuing the real query)
+    checks = [
+        ("chat history page", "ix_chat_history_user_ts_id", True,
+         lambda db: chat_history_page(db, user_id, limit=50)),
+        ("chat history page (after cursor)", "ix_chat_history_user_ts_id", True,
+         lambda db: chat_history_page(db, user_id, limit=50, after=cursor)),
+        ("chat history page (before cursor)", "ix_chat_history_user_ts_id", True,
+         lambda db: chat_history_page(db, user_id, limit=50, before=cursor)),
+        ("latest order total (<bill>)", "ix_order_user_id_id", True,
+         lambda db: latest_order_total(user_id, db)),
+        ("latest order totals (batch)", "ix_order_user_id_id", False,
+         lambda db: latest_order_totals(range(1, 51), db)),
+        ("order history page", "ix_order_user_id_id", False,
+         lambda db: order_history_page(db, user_id, limit=20)),
+        ("order history items join", "ix_order_item_order_id", False,
+         lambda db: order_history_page(db, user_id, limit=20)),
+    ]
+
+    before = {label: capture(engine, run)[0] for label, _, _, run in checks}
+    created = ensure_indexes(engine)
+    print(f"migration created {len(created)} index(es)")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+    failed = False
+    for label, index_name, index_ordered, run in checks:
+        elapsed, executed = capture(engine, run)
+        plan = [line for statement, parameters in executed for line in explain(engine, statement, parameters)]
+        uses_index = any(index_name in line for line in plan)
+        sorts = any("TEMP B-TREE" in line and "ORDER BY" in line for line in plan)
+        ok = uses_index and not (index_ordered and sorts)
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'}  {label}: {before[label] * 1000:.2f} ms -> {elapsed * 1000:.2f} ms")
+        if not ok:
+            for line in plan:
+                print(f"        {line}")
+
+    if not args.db:
+        os.remove(path)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Compare FAISS index types on restaurant_qa.csv: accuracy, latency, memory, build time.
+
+    python benchmarks/eval_retrieval.py
+    python benchmarks/eval_retrieval.py --queries paraphrases.csv --k 5 --json results.json
+
+Queries come from --queries (a CSV with Question and Answer columns, e.g.
+hand-written paraphrases) or, by default, a held-out split: for every
+answer with several questions one question is held out and the index is
+built from the rest. If no answer has more than one question, each
+question is perturbed (dropped words, changed case and punctuation)
+instead. The winning type goes into FAISS_INDEX_TYPE for train_model.py.
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from bench_env import setup_imports
+
+setup_imports()
+from index_builder import INDEX_TYPES, timed_build, index_nbytes
+from model_runtime import ENCODER_NAME
+
+QA_PATH = "model/restaurant_qa.csv"
+
+
+# ------------------------------
+# Query sets
+# ------------------------------
+def held_out_split(questions, answers, seed=0):
+    """Return (indexed rows, query rows) holding out one question per multi-question answer."""
+    rng = random.Random(seed)
+    by_answer = {}
+    for row, answer in enumerate(answers):
+        by_answer.setdefault(answer, []).append(row)
+    held = set()
+    for rows in by_answer.values():
+        if len(rows) > 1:
+            held.add(rng.choice(rows))
+    indexed = [row for row in range(len(questions)) if row not in held]
+    return indexed, sorted(held)
+
+
+def perturb(text, rng):
+    words = text.replace("?", "").replace("!", "").split()
+    if len(words) > 3:
+        del words[rng.randrange(len(words))]
+    text = " ".join(words)
+    return text.lower() if rng.random() < 0.5 else text
+
+
+def build_query_set(df, queries_path, seed):
+    questions = df["Question"].astype(str).tolist()
+    answers = df["Answer"].astype(str).tolist()
+    if queries_path:
+        qdf = pd.read_csv(queries_path)
+        return questions, answers, qdf["Question"].astype(str).tolist(), qdf["Answer"].astype(str).tolist(), "file"
+
+    indexed, held = held_out_split(questions, answers, seed)
+    if held:
+        return ([questions[r] for r in indexed], [answers[r] for r in indexed],
+                [questions[r] for r in held], [answers[r] for r in held], "held-out")
+
+    rng = random.Random(seed)
+    return questions, answers, [perturb(q, rng) for q in questions], answers, "perturbed"
+
+
+# ------------------------------
+# Measurements
+# ------------------------------
+def percentile_ms(samples, pct):
+    return round(float(np.percentile(samples, pct)) * 1000, 4) if len(samples) else 0.0
+
+
+def evaluate(kind, corpus_vecs, corpus_answers, query_vecs, query_answers, exact_ids, k):
+    index, build_s = timed_build(kind, corpus_vecs)
+
+    latencies = []
+    for vec in query_vecs:
+        start = time.perf_counter()
+        index.search(vec[None, :], k)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    _, ids = index.search(query_vecs, k)
+    batch_s = time.perf_counter() - start
+
+    neighbor_recall = np.mean([
+        len(set(found[found >= 0]) & set(exact)) / k for found, exact in zip(ids, exact_ids)
+    ])
+    answer_hits = [
+        [corpus_answers[i] if i >= 0 else None for i in row] for row in ids
+    ]
+    top1 = np.mean([hits[0] == truth for hits, truth in zip(answer_hits, query_answers)])
+    answer_recall = np.mean([truth in hits for hits, truth in zip(answer_hits, query_answers)])
+
+    return {
+        "index": kind,
+        "vectors": int(index.ntotal),
+        "build_s": round(build_s, 4),
+        "memory_bytes": index_nbytes(index),
+        f"recall@{k}": round(float(neighbor_recall), 4),
+        f"answer_recall@{k}": round(float(answer_recall), 4),
+        "top1_accuracy": round(float(top1), 4),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+        "batch_qps": round(len(query_vecs) / batch_s, 1) if batch_s > 0 else None,
+    }
+
+
+def recommend(results, k, min_recall):
+    """Fastest type whose neighbor recall clears ``min_recall`` and whose top-1 matches flat."""
+    flat = next(r for r in results if r["index"] == "flat")
+    ok = [r for r in results
+          if r[f"recall@{k}"] >= min_recall and r["top1_accuracy"] >= flat["top1_accuracy"] - 0.01]
+    return min(ok, key=lambda r: r["p50_ms"])["index"] if ok else "flat"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--qa", default=QA_PATH, help="training CSV with Question and Answer columns")
+    parser.add_argument("--queries", help="CSV of evaluation queries (Question, Answer)")
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--min-recall", type=float, default=0.95, help="recall@k a type needs to be recommended")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    df = pd.read_csv(args.qa)
+    corpus_q, corpus_a, query_q, query_a, source = build_query_set(df, args.queries, args.seed)
+    print(f"{len(corpus_q)} indexed questions, {len(query_q)} {source} queries, k={args.k}")
+
+    model = SentenceTransformer(ENCODER_NAME)
+    corpus_vecs = model.encode(corpus_q, convert_to_numpy=True).astype(np.float32)
+    query_vecs = model.encode(query_q, convert_to_numpy=True).astype(np.float32)
+    k = min(args.k, len(corpus_q))
+
+    # Exact neighbors from the flat index are the ground truth for recall@k
+    exact, _ = timed_build("flat", corpus_vecs)
+    _, exact_ids = exact.search(query_vecs, k)
+
+    kinds = ["flat"] + [kind for kind in args.types if kind != "flat"]
+    results = [evaluate(kind, corpus_vecs, corpus_a, query_vecs, query_a, exact_ids, k) for kind in kinds]
+
+    columns = list(results[0].keys())
+    print(" | ".join(f"{c:>14}" for c in columns))
+    for row in results:
+        print(" | ".join(f"{str(row[c]):>14}" for c in columns))
+    best = recommend(results, k, args.min_recall)
+    print(f"\nRecommended: FAISS_INDEX_TYPE={best}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"queries": source, "k": k, "results": results, "recommended": best}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
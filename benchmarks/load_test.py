@@ -0,0 +1,399 @@
+"""End-to-end load test: starts the API against a seeded SQLite stand-in and
+replays a mixed traffic profile at fixed concurrency levels.
+
+Each level runs for --duration seconds with that many client threads, each
+sending back-to-back requests picked by --mix weight. Per endpoint it
+reports throughput, p50/p95/p99 latency, status codes and the SQL
+statements the request issued (the server's X-DB-Queries header), and
+writes everything to a JSON file tagged with the git commit:
+
+    python benchmarks/load_test.py --concurrency 1 8 32 --duration 20
+    python benchmarks/load_test.py --mix order_chat=3,menu=5,order_history=2 --output run.json
+    python benchmarks/load_test.py --compare benchmarks/results/old.json   # print deltas vs an earlier run
+
+FAQ chats go through the encoder, so they need the model dependencies and a
+trained release in model/; without them they show up as 500s. Extra
+environment for the server (e.g. CHAT_LOG_WRITE_BEHIND=1) is passed with
+--env NAME=VALUE. Per-user chat rate limiting is off unless --env sets
+CHAT_USER_RATE, so the numbers measure the service, not the limiter.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from bench_env import ROOT, setup_imports
+
+# The server is started with the same Resturant_Project alias on its path
+WORKDIR = setup_imports(prefix="loadtest-")
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.model import Base, User, MenuItem, RestaurantInfo
+from bench_menu_matcher import synthetic_menu
+
+DEFAULT_MIX = "faq_chat=30,order_chat=20,menu=20,order=10,chat_history=10,order_history=10"
+FAQ_QUESTIONS = (
+    "what are your opening hours", "do you have wifi", "is there parking",
+    "how long does delivery take", "where are you located", "do you have vegan options",
+    "what is your phone number", "are you open on weekends", "what's my bill",
+)
+CHUNK = 50_000
+
+
+# ------------------------------
+# Seeding
+# ------------------------------
+def seed(path, menu_items, users, orders, chats, items_per_order=2, seed_value=0) -> list:
+    """Create the schema in a fresh SQLite file and bulk-load it; returns the menu."""
+    rng = random.Random(seed_value)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    menu = synthetic_menu(menu_items, seed=seed_value)
+
+    db = sessionmaker(bind=engine)()
+    db.add(RestaurantInfo(id=1, name="Load Test Diner", address="1 Bench St", contact="0300", wifi=True,
+                          parking=True, opening_hours="9am", closing_time="11pm", delivery_time="30 min"))
+    db.add_all([MenuItem(id=m["id"], name=m["name"], price=m["price"], category=rng.choice(("mains", "drinks")))
+                for m in menu])
+    db.add_all([User(id=i, name=f"user{i}", contact=f"0300{i:07d}", email=f"u{i}@example.com")
+                for i in range(1, users + 1)])
+    db.commit()
+    db.close()
+
+    start = datetime.datetime.now() - datetime.timedelta(days=30)
+
+    def stamp(seconds):
+        return (start + datetime.timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        for lo in range(0, chats, CHUNK):
+            cur.executemany(
+                "INSERT INTO chat_history (user_id, question, answer, timestamp) VALUES (?, ?, ?, ?)",
+                [(rng.randint(1, users), f"q{n}", f"a{n}", stamp(n)) for n in range(lo, min(lo + CHUNK, chats))],
+            )
+        for lo in range(0, orders, CHUNK):
+            hi = min(lo + CHUNK, orders)
+            cur.executemany(
+                'INSERT INTO "order" (id, user_id, status, order_time, total_amount, payment_method, '
+                "delivery_address, special_instructions) VALUES (?, ?, 'Paid', ?, ?, 'cash', '', '')",
+                [(n + 1, rng.randint(1, users), stamp(n), float(rng.randint(100, 5000))) for n in range(lo, hi)],
+            )
+            rows = []
+            for n in range(lo, hi):
+                for item in rng.sample(menu, min(items_per_order, len(menu))):
+                    rows.append((n + 1, item["id"], item["price"]))
+            cur.executemany(
+                "INSERT INTO order_item (order_id, menu_item_id, quantity, price_per_unit, customization) "
+                "VALUES (?, ?, 1, ?, '')",
+                rows,
+            )
+        raw.commit()
+        cur.execute("ANALYZE")
+    finally:
+        raw.close()
+
+    from sales_rollups import backfill
+    db = sessionmaker(bind=engine)()
+    try:
+        backfill(db, log=None)
+    finally:
+        db.close()
+    engine.dispose()
+    return menu
+
+
+# ------------------------------
+# Server
+# ------------------------------
+def start_server(workdir, db_path, port, server, extra_env) -> subprocess.Popen:
+    """Run app.py the way it is deployed, with the package importable as Resturant_Project."""
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "DB_QUERY_COUNT_HEADER": "1",
+        "CHAT_USER_RATE": "0",
+        "PYTHONPATH": os.pathsep.join([workdir, ROOT, env.get("PYTHONPATH", "")]),
+    })
+    env.update(extra_env)
+
+    if server == "gunicorn":
+        env["BIND"] = f"127.0.0.1:{port}"
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"]
+    else:
+        cmd = [sys.executable, "-m", "flask", "--app", "app", "run",
+               "--port", str(port), "--no-reload", "--no-debugger", "--with-threads"]
+    log = open(os.path.join(workdir, "server.log"), "wb")
+    return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_until_up(port, proc, timeout=60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server not up after {timeout}s")
+
+
+# ------------------------------
+# Traffic
+# ------------------------------
+def parse_mix(text) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in REQUESTS:
+            raise SystemExit(f"unknown endpoint {name!r} in --mix; expected {', '.join(REQUESTS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def faq_chat(rng, ctx):
+    return "POST", "/chat", {"user_id": rng.randint(1, ctx["users"]), "message": rng.choice(FAQ_QUESTIONS)}
+
+
+def order_chat(rng, ctx):
+    item = rng.choice(ctx["menu"])
+    message = f"i want {rng.randint(1, 3)} {item['name'].lower()}"
+    return "POST", "/chat", {"user_id": rng.randint(1, ctx["users"]), "message": message}
+
+
+def menu(rng, ctx):
+    return "GET", "/menu", None
+
+
+def order(rng, ctx):
+    items = [{"menu_item_id": m["id"], "quantity": rng.randint(1, 3), "price_per_unit": m["price"]}
+             for m in rng.sample(ctx["menu"], min(2, len(ctx["menu"])))]
+    total = sum(i["quantity"] * i["price_per_unit"] for i in items)
+    return "POST", "/order", {"user_id": rng.randint(1, ctx["users"]), "total_amount": total,
+                              "payment_method": rng.choice(("cash", "card")), "items": items}
+
+
+def chat_history(rng, ctx):
+    return "GET", f"/chat_history/{rng.randint(1, ctx['users'])}?limit=20", None
+
+
+def order_history(rng, ctx):
+    return "GET", f"/order_history/{rng.randint(1, ctx['users'])}?limit=20", None
+
+
+# name -> builder returning (method, path, json body); the name is the reported endpoint
+REQUESTS = {fn.__name__: fn for fn in (faq_chat, order_chat, menu, order, chat_history, order_history)}
+
+
+def send(conn, method, path, body):
+    payload = json.dumps(body).encode() if body is not None else None
+    headers = {"Content-Type": "application/json"} if payload is not None else {}
+    conn.request(method, path, body=payload, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    queries = response.getheader("X-DB-Queries")
+    return response.status, int(queries) if queries is not None else None
+
+
+def run_level(port, concurrency, duration, mix, ctx, seed_value) -> list:
+    """Drive ``concurrency`` closed-loop clients for ``duration`` seconds; returns samples."""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = []  # (endpoint, status, seconds, db queries)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(n):
+        rng = random.Random(seed_value * 1000 + n)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local = []
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            method, path, body = REQUESTS[name](rng, ctx)
+            start = time.perf_counter()
+            try:
+                status, queries = send(conn, method, path, body)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                status, queries = 0, None
+            local.append((name, status, time.perf_counter() - start, queries))
+        conn.close()
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples
+
+
+# ------------------------------
+# Reporting
+# ------------------------------
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(samples, duration) -> dict:
+    latencies = sorted(s[2] * 1000 for s in samples)
+    statuses = {}
+    for _, status, _, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    queries = [s[3] for s in samples if s[3] is not None]
+    return {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / duration, 2),
+        "errors": sum(1 for s in samples if s[1] == 0 or s[1] >= 500),
+        "status": statuses,
+        "p50_ms": round(percentile(latencies, 50), 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 3) if latencies else None,
+        "max_ms": round(latencies[-1], 3) if latencies else None,
+        "db_queries_avg": round(sum(queries) / len(queries), 2) if queries else None,
+        "db_queries_max": max(queries) if queries else None,
+    }
+
+
+def report_level(samples, duration) -> dict:
+    by_endpoint = {}
+    for sample in samples:
+        by_endpoint.setdefault(sample[0], []).append(sample)
+    return {
+        "overall": summarize(samples, duration),
+        "endpoints": {name: summarize(rows, duration) for name, rows in sorted(by_endpoint.items())},
+    }
+
+
+def print_level(concurrency, level) -> None:
+    overall = level["overall"]
+    print(f"\nconcurrency {concurrency}: {overall['throughput_rps']} req/s, "
+          f"p50 {overall['p50_ms']} ms, p95 {overall['p95_ms']} ms, p99 {overall['p99_ms']} ms, "
+          f"{overall['errors']} errors")
+    print(f"  {'endpoint':<14} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'errors':>7}")
+    for name, s in level["endpoints"].items():
+        print(f"  {name:<14} {s['throughput_rps']:>8} {s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9} "
+              f"{s['db_queries_avg'] if s['db_queries_avg'] is not None else '-':>8} {s['errors']:>7}")
+
+
+def git_info() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def compare(current, baseline_path) -> None:
+    """Print throughput and p95 changes per endpoint against an earlier result file."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\ncompared with {baseline_path} (commit {(baseline['git']['commit'] or '?')[:10]})")
+    for concurrency, level in current["levels"].items():
+        old_level = baseline["levels"].get(concurrency)
+        if old_level is None:
+            continue
+        print(f"  concurrency {concurrency}")
+        for name, s in {"overall": level["overall"], **level["endpoints"]}.items():
+            old = old_level["overall"] if name == "overall" else old_level["endpoints"].get(name)
+            if not old or not old["throughput_rps"] or not old["p95_ms"] or s["p95_ms"] is None:
+                continue
+            rps = (s["throughput_rps"] / old["throughput_rps"] - 1) * 100
+            p95 = (s["p95_ms"] / old["p95_ms"] - 1) * 100
+            print(f"    {name:<14} req/s {rps:+6.1f}%   p95 {p95:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--menu-items", type=int, default=200)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=50_000, help="seeded order history rows")
+    parser.add_argument("--chats", type=int, default=100_000, help="seeded chat history rows")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds of unrecorded traffic before the first level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,... from: " + ", ".join(REQUESTS))
+    parser.add_argument("--server", choices=("flask", "gunicorn"), default="flask")
+    parser.add_argument("--port", type=int, default=5057)
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="extra server environment")
+    parser.add_argument("--db", help="SQLite file to seed and serve (default: a temp file)")
+    parser.add_argument("--output", help="result JSON (default: benchmarks/results/load-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="earlier result JSON to print deltas against")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    workdir = WORKDIR
+    db_path = args.db or os.path.join(workdir, "load.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    start = time.perf_counter()
+    menu_rows = seed(db_path, args.menu_items, args.users, args.orders, args.chats, seed_value=args.seed)
+    print(f"seeded {args.menu_items} menu items, {args.users} users, {args.orders} orders, "
+          f"{args.chats} chats in {time.perf_counter() - start:.1f}s ({db_path})")
+
+    ctx = {"menu": menu_rows, "users": args.users}
+    proc = start_server(workdir, db_path, args.port, args.server, extra_env)
+    try:
+        wait_until_up(args.port, proc)
+        if args.warmup > 0:
+            run_level(args.port, max(args.concurrency), args.warmup, mix, ctx, args.seed + 1)
+
+        levels = {}
+        for concurrency in args.concurrency:
+            samples = run_level(args.port, concurrency, args.duration, mix, ctx, args.seed)
+            levels[str(concurrency)] = report_level(samples, args.duration)
+            print_level(concurrency, levels[str(concurrency)])
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    git = git_info()
+    result = {
+        "git": git,
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            "menu_items": args.menu_items, "users": args.users, "orders": args.orders, "chats": args.chats,
+            "duration": args.duration, "mix": mix, "server": args.server, "env": extra_env, "seed": args.seed,
+        },
+        "levels": levels,
+    }
+    output = args.output
+    if not output:
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(ROOT, "benchmarks", "results", f"load-{(git['commit'] or 'nogit')[:10]}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nresults written to {output} (server log: {os.path.join(workdir, 'server.log')})")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
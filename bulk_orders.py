@@ -0,0 +1,224 @@
+import datetime
+import json
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from database.model import Order, OrderItem, User
+from reference_data import get_snapshot
+from sales_rollups import record_orders, order_row, rollup_slot
+from Resturant_Project.config import BULK_ORDER_CHUNK_SIZE
+
+MAX_CHUNK_SIZE = 5000
+
+_ORDER_FIELDS = ("payment_method", "delivery_address", "special_instructions", "status")
+
+
+class OrderRejected(ValueError):
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+# ------------------------------
+# Input
+# ------------------------------
+def iter_json_orders(data):
+    """Orders from a JSON body: either a list or {"orders": [...]}."""
+    orders = data.get("orders") if isinstance(data, dict) else data
+    if not isinstance(orders, list):
+        raise ValueError("expected a list of orders or {\"orders\": [...]}")
+    return iter(orders)
+
+
+def iter_jsonl_orders(stream):
+    """Orders from a JSON Lines stream (text or bytes lines), read one line at a time.
+
+    A line that isn't valid JSON is yielded as an exception so it shows up
+    in the report against its position instead of aborting the import.
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+
+# ------------------------------
+# Validation
+# ------------------------------
+_menu_cache = {"version": None, "prices": {}}
+
+
+def menu_prices(db: Session) -> dict:
+    """menu_item_id -> price, rebuilt only when the reference snapshot changes."""
+    snapshot = get_snapshot(db)
+    if _menu_cache["version"] != snapshot.version:
+        _menu_cache["prices"] = {item["id"]: item["price"] for item in snapshot.menu}
+        _menu_cache["version"] = snapshot.version
+    return _menu_cache["prices"]
+
+
+def _parse_time(value):
+    if value is None:
+        return datetime.datetime.now()
+    try:
+        return datetime.datetime.fromisoformat(str(value))
+    except ValueError:
+        raise OrderRejected([f"invalid order_time: {value}"])
+
+
+def validate_order(data, prices: dict):
+    """Return (order row, item rows, total) or raise OrderRejected.
+
+    Prices and the total come from the menu, never from the payload.
+    """
+    if isinstance(data, Exception):
+        raise OrderRejected([f"invalid JSON: {data}"])
+    if not isinstance(data, dict):
+        raise OrderRejected(["order must be an object"])
+
+    errors = []
+    user_id = data.get("user_id")
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        errors.append("user_id must be an integer")
+
+    raw_items = data.get("items")
+    if not isinstance(raw_items, list) or not raw_items:
+        errors.append("items must be a non-empty list")
+        raw_items = []
+
+    items = []
+    total = 0.0
+    for pos, item in enumerate(raw_items):
+        if not isinstance(item, dict):
+            errors.append(f"items[{pos}] must be an object")
+            continue
+        menu_item_id = item.get("menu_item_id")
+        quantity = item.get("quantity", 1)
+        if menu_item_id not in prices:
+            errors.append(f"items[{pos}]: unknown menu_item_id {menu_item_id}")
+            continue
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            errors.append(f"items[{pos}]: quantity must be a positive integer")
+            continue
+        price = prices[menu_item_id]
+        total += quantity * price
+        items.append({
+            "menu_item_id": menu_item_id,
+            "quantity": quantity,
+            "price_per_unit": price,
+            "customization": item.get("customization", ""),
+        })
+
+    order_time = None
+    try:
+        order_time = _parse_time(data.get("order_time"))
+    except OrderRejected as e:
+        errors.extend(e.errors)
+
+    if errors:
+        raise OrderRejected(errors)
+
+    order = {"user_id": user_id, "total_amount": round(total, 2), "order_time": order_time}
+    for field in _ORDER_FIELDS:
+        if field in data:
+            order[field] = data[field]
+    order.setdefault("status", "Pending")
+    order.setdefault("special_instructions", "")
+    return order, items, order["total_amount"]
+
+
+def known_user_ids(db: Session, user_ids) -> set:
+    """The subset of ``user_ids`` that exist, in one IN query."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return set()
+    return {user_id for (user_id,) in db.query(User.id).filter(User.id.in_(user_ids)).all()}
+
+
+# ------------------------------
+# Insert
+# ------------------------------
+def _insert_orders(db: Session, orders: list) -> list:
+    """Insert order rows and return their ids in the same order."""
+    dialect = db.get_bind().dialect
+    if getattr(dialect, "insert_executemany_returning_sort_by_parameter_order", False):
+        result = db.execute(insert(Order).returning(Order.id, sort_by_parameter_order=True), orders)
+        return [row.id for row in result]
+    # MySQL has no RETURNING and doesn't guarantee consecutive ids for a
+    # multi-row insert, so orders go in one core INSERT each; their line
+    # items are still sent in one executemany per chunk.
+    return [db.execute(insert(Order).values(**order)).inserted_primary_key[0] for order in orders]
+
+
+def insert_chunk(db: Session, chunk: list) -> list:
+    """Insert validated (position, order, items, total) tuples in one transaction."""
+    orders = [order for _, order, _, _ in chunk]
+    order_ids = _insert_orders(db, orders)
+
+    item_rows = []
+    for order_id, (_, _, items, _) in zip(order_ids, chunk):
+        for item in items:
+            item_rows.append({**item, "order_id": order_id})
+    if item_rows:
+        db.execute(insert(OrderItem), item_rows)
+    record_orders(db, (
+        order_row(order["order_time"], total, order.get("payment_method"),
+                  [(item["menu_item_id"], item["quantity"], item["price_per_unit"]) for item in items])
+        for _, order, items, total in chunk
+    ), rollup_slot(order_ids[0]) if order_ids else 0)
+    db.commit()
+
+    return [
+        {"index": pos, "status": "created", "order_id": order_id, "total_amount": total}
+        for order_id, (pos, _, _, total) in zip(order_ids, chunk)
+    ]
+
+
+def ingest_orders(db: Session, orders, chunk_size=BULK_ORDER_CHUNK_SIZE) -> dict:
+    """Validate and insert an iterable of order payloads in chunks.
+
+    Invalid orders, including ones for users that don't exist, are rejected
+    individually; a chunk that fails to insert is rolled back and its orders
+    are reported as failed. Returns a summary
+    plus one result per input order, in input order.
+    """
+    chunk_size = max(1, min(int(chunk_size), MAX_CHUNK_SIZE))
+    prices = menu_prices(db)
+    results = []
+    chunk = []
+
+    def flush():
+        pending = list(chunk)
+        try:
+            # An unknown user would fail the whole chunk on its foreign key
+            known = known_user_ids(db, (order["user_id"] for _, order, _, _ in chunk))
+            pending = [entry for entry in chunk if entry[1]["user_id"] in known]
+            results.extend(
+                {"index": pos, "status": "rejected", "errors": [f"unknown user_id {order['user_id']}"]}
+                for pos, order, _, _ in chunk if order["user_id"] not in known
+            )
+            if pending:
+                results.extend(insert_chunk(db, pending))
+        except Exception as e:
+            db.rollback()
+            results.extend({"index": pos, "status": "failed", "error": str(e)} for pos, _, _, _ in pending)
+        chunk.clear()
+
+    for pos, data in enumerate(orders):
+        try:
+            order, items, total = validate_order(data, prices)
+        except OrderRejected as e:
+            results.append({"index": pos, "status": "rejected", "errors": e.errors})
+            continue
+        chunk.append((pos, order, items, total))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    results.sort(key=lambda r: r["index"])
+    summary = {status: sum(1 for r in results if r["status"] == status) for status in ("created", "rejected", "failed")}
+    return {"received": len(results), **summary, "results": results}
@@ -0,0 +1,163 @@
+import atexit
+import os
+import queue
+import sys
+import threading
+import time
+from sqlalchemy import insert
+from database.model import ChatHistory
+
+_STOP = object()
+
+
+class ChatLogWriter:
+    """Write-behind buffer for ChatHistory rows.
+
+    ``log()`` puts a row on a bounded queue and returns; a background thread
+    writes rows in multi-row INSERTs once ``batch_size`` rows are waiting or
+    ``flush_interval_ms`` has passed since the first one. When the queue is
+    full the caller waits up to ``put_timeout_ms`` and then writes its own row
+    synchronously, so producers slow down instead of rows being dropped.
+    """
+
+    def __init__(self, session_factory, max_queue=10000, batch_size=200, flush_interval_ms=500, put_timeout_ms=50):
+        self.session_factory = session_factory
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval_ms)) / 1000.0
+        self.put_timeout = max(0.0, float(put_timeout_ms)) / 1000.0
+        self.max_queue = int(max_queue)
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+        self.enqueued = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.sync_writes = 0
+        self.flush_errors = 0
+        self.rows_dropped = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def _ensure_worker(self):
+        # Threads don't survive fork, so each worker process starts its own
+        if self._pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._worker.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+            self._worker = threading.Thread(target=self._run, name="chat-log-writer", daemon=True)
+            self._worker.start()
+            self._pid = os.getpid()
+
+    def log(self, user_id, question, answer, timestamp) -> None:
+        row = {"user_id": user_id, "question": question, "answer": answer, "timestamp": timestamp}
+        self._ensure_worker()
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self.sync_writes += 1
+            self._write([row])
+            return
+        with self._stats_lock:
+            self.enqueued += 1
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if row is _STOP:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    def _run(self):
+        while True:
+            batch, stopping = self._collect()
+            if batch:
+                self._write(batch)
+            if stopping:
+                # Drain whatever arrived before shutdown
+                rest = []
+                while True:
+                    try:
+                        row = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if row is not _STOP:
+                        rest.append(row)
+                for start in range(0, len(rest), self.batch_size):
+                    self._write(rest[start:start + self.batch_size])
+                return
+
+    def _write(self, rows) -> None:
+        start = time.perf_counter()
+        for attempt in range(2):
+            db = self.session_factory()
+            try:
+                db.execute(insert(ChatHistory), rows)
+                db.commit()
+                break
+            except Exception as e:
+                db.rollback()
+                with self._stats_lock:
+                    self.flush_errors += 1
+                if attempt == 1:
+                    with self._stats_lock:
+                        self.rows_dropped += len(rows)
+                    print(f"chat log: dropped {len(rows)} rows: {e}", file=sys.stderr)
+                    return
+            finally:
+                db.close()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self.flushes += 1
+            self.rows_written += len(rows)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+    def close(self, timeout=10.0) -> None:
+        """Flush everything queued and stop the background thread."""
+        if self._pid != os.getpid() or not self._worker.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._worker.join(timeout)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self.max_queue,
+                "enqueued": self.enqueued,
+                "rows_written": self.rows_written,
+                "flushes": self.flushes,
+                "sync_writes": self.sync_writes,
+                "flush_errors": self.flush_errors,
+                "rows_dropped": self.rows_dropped,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+                "max_flush_ms": round(self.max_flush_ms, 3),
+                "avg_flush_ms": round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            }
+
+
+def create_chat_log_writer(session_factory, **options) -> ChatLogWriter:
+    writer = ChatLogWriter(session_factory, **options)
+    atexit.register(writer.close)
+    return writer
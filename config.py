@@ -1,3 +1,4 @@
+import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
@@ -8,7 +9,140 @@ HOST = "localhost"
 PORT = "3306"
 DATABASE = "restaurant_db"
 
-SQLALCHEMY_DATABASE_URL = f"mysql+mysqlconnector://{USERNAME}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
+# DATABASE_URL overrides the MySQL settings above (e.g. a local SQLite stand-in)
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL", f"mysql+mysqlconnector://{USERNAME}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
+)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Connection pool: POOL_SIZE persistent connections plus up to POOL_MAX_OVERFLOW
+# extra under load; a request waits POOL_TIMEOUT seconds for a free one.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # below MySQL's wait_timeout
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+
+def engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        # SQLite has no server-side pool to tune; just allow use across threads
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": POOL_SIZE,
+        "max_overflow": POOL_MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
 SessionLocal = sessionmaker(bind=engine)
+
+# Inference batching: concurrent chat queries arriving within the window are
+# encoded and searched together, up to BATCH_MAX_SIZE queries per batch.
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "5"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+# Threads running encode/search batches in parallel, per server process. One
+# encode already uses every core through torch's intra-op threads, so raise
+# this only after measuring (e.g. with torch.set_num_threads lowered to match)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+
+# How often (seconds) a running process checks model/CURRENT (and each loaded
+# shard's CURRENT) for a build newly published by train_model.py; 0 = never
+MODEL_RELOAD_CHECK_INTERVAL = float(os.getenv("MODEL_RELOAD_CHECK_INTERVAL", "5"))
+
+# Per-restaurant index shards (model/shards/<restaurant_id>/): at most
+# MODEL_MAX_SHARDS of them, and MODEL_SHARD_MEMORY_MB of artifacts, stay
+# loaded per process; the least recently used are dropped first
+MODEL_MAX_SHARDS = int(os.getenv("MODEL_MAX_SHARDS", "8"))
+MODEL_SHARD_MEMORY_MB = float(os.getenv("MODEL_SHARD_MEMORY_MB", "512"))
+
+# Seconds between checks of the menu table for changes; order parsing keeps
+# using the compiled menu matcher until one is seen
+MENU_CHECK_INTERVAL = float(os.getenv("MENU_CHECK_INTERVAL", "30"))
+
+# Dice score (0-1) at which a misspelt order phrase is taken to mean the top
+# menu item, the lower score at which items are only offered as suggestions,
+# and how many suggestions to offer
+FUZZY_AUTOCORRECT_SCORE = float(os.getenv("FUZZY_AUTOCORRECT_SCORE", "0.75"))
+FUZZY_SUGGEST_SCORE = float(os.getenv("FUZZY_SUGGEST_SCORE", "0.4"))
+FUZZY_MAX_SUGGESTIONS = int(os.getenv("FUZZY_MAX_SUGGESTIONS", "3"))
+
+# Seconds a reference-data snapshot (restaurant info, menu, services, ...)
+# is served before it is reloaded from the DB. Commits made through the
+# app's own sessions invalidate it at once, but only in that process: other
+# gunicorn workers, other services and raw SQL edits can leave /menu,
+# /restaurant/info and tag answers this many seconds stale (POST
+# /admin/reference_data/invalidate clears the worker that receives it).
+REFERENCE_DATA_TTL = float(os.getenv("REFERENCE_DATA_TTL", "300"))
+
+# FAISS index train_model.py builds: flat, hnsw, ivf, sq8 or pq
+# (benchmarks/eval_retrieval.py measures the trade-offs on our data), plus
+# the per-type knobs. FAISS_IVF_NLIST=0 picks about 4 * sqrt(vectors) lists.
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "80"))
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "0"))
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "8"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "16"))
+
+# Cache of retrieved template answers, keyed on the normalized query text
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+
+# Load the encoder and index at startup instead of on the first chat request
+PRELOAD_MODEL = os.getenv("PRELOAD_MODEL", "0") == "1"
+
+# Write-behind chat logging: ChatHistory rows are queued and inserted in bulk
+# off the request path instead of committed inside every /chat call.
+CHAT_LOG_WRITE_BEHIND = os.getenv("CHAT_LOG_WRITE_BEHIND", "0") == "1"
+CHAT_LOG_QUEUE_SIZE = int(os.getenv("CHAT_LOG_QUEUE_SIZE", "10000"))
+CHAT_LOG_BATCH_SIZE = int(os.getenv("CHAT_LOG_BATCH_SIZE", "200"))
+CHAT_LOG_FLUSH_INTERVAL_MS = float(os.getenv("CHAT_LOG_FLUSH_INTERVAL_MS", "500"))
+CHAT_LOG_PUT_TIMEOUT_MS = float(os.getenv("CHAT_LOG_PUT_TIMEOUT_MS", "50"))
+
+# Orders per transaction for POST /orders/bulk (overridable with ?chunk_size=)
+BULK_ORDER_CHUNK_SIZE = int(os.getenv("BULK_ORDER_CHUNK_SIZE", "500"))
+
+# Async serving (python asgi.py): requests beyond ASYNC_MAX_CONCURRENCY wait up
+# to ASYNC_QUEUE_TIMEOUT seconds for a slot before getting a 503. Route
+# handlers (DB work) run on ASYNC_REQUEST_WORKERS threads off the event loop.
+ASYNC_MAX_CONCURRENCY = int(os.getenv("ASYNC_MAX_CONCURRENCY", "64"))
+ASYNC_QUEUE_TIMEOUT = float(os.getenv("ASYNC_QUEUE_TIMEOUT", "2"))
+ASYNC_REQUEST_WORKERS = int(os.getenv("ASYNC_REQUEST_WORKERS", str(POOL_SIZE + POOL_MAX_OVERFLOW)))
+
+# /chat admission control: each user gets CHAT_USER_RATE requests/second with
+# bursts of CHAT_USER_BURST (429 beyond that), and at most CHAT_MAX_IN_FLIGHT
+# chat messages run at once (default: what the inference workers batch
+# together); a /chat/batch request counts every message, in chunks that fit
+# the burst and the slots. CHAT_ORDER_RESERVED of those slots only serve order
+# messages; others wait up to CHAT_QUEUE_TIMEOUT seconds, CHAT_MAX_QUEUE at
+# most, before a 503. 0 = off.
+CHAT_USER_RATE = float(os.getenv("CHAT_USER_RATE", "2"))
+CHAT_USER_BURST = float(os.getenv("CHAT_USER_BURST", "10"))
+CHAT_MAX_IN_FLIGHT = int(os.getenv("CHAT_MAX_IN_FLIGHT", str(INFERENCE_WORKERS * BATCH_MAX_SIZE)))
+CHAT_ORDER_RESERVED = int(os.getenv("CHAT_ORDER_RESERVED", str(max(1, CHAT_MAX_IN_FLIGHT // 4))))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "1"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "256"))
+
+# Sales rollup rows are split into ROLLUP_SLOTS slots per key (an order
+# updates slot order_id % ROLLUP_SLOTS), so concurrent orders on the same day
+# rarely wait on each other's row locks; reads sum the slots
+ROLLUP_SLOTS = int(os.getenv("ROLLUP_SLOTS", "16"))
+
+# Rendered /menu and /restaurant/info bodies kept per data version
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+
+# Slow-request profiling: requests slower than PROFILE_SLOW_REQUEST_MS (0 = off)
+# keep their stage timings and stack samples, dumped as JSON into PROFILE_DIR
+PROFILE_SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# Count the SQL statements each request issues: reported in an X-DB-Queries
+# response header (benchmarks/load_test.py turns this on) and, streamed bodies
+# included, in the http_request_db_queries histogram. Streamed responses get
+# no header, as their body runs after the headers are sent
+QUERY_COUNT_HEADER = os.getenv("DB_QUERY_COUNT_HEADER", "0") == "1"
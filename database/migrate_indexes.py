@@ -0,0 +1,55 @@
+"""Create indexes declared in database/model.py that an existing database lacks.
+
+``create_all`` only builds indexes together with new tables, so databases
+created before an index was declared need this once:
+
+    python -m database.migrate_indexes            # create what's missing
+    python -m database.migrate_indexes --dry-run  # just print the DDL
+
+Indexes are matched by name, so running it again is a no-op.
+"""
+import argparse
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex
+from database.model import Base
+
+
+def missing_indexes(engine, metadata=Base.metadata) -> list:
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for table in metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing.extend(index for index in sorted(table.indexes, key=lambda i: i.name) if index.name not in existing)
+    return missing
+
+
+def ensure_indexes(engine, metadata=Base.metadata, dry_run=False) -> list:
+    """Create (or with ``dry_run`` only list) missing indexes; returns their DDL."""
+    statements = []
+    for index in missing_indexes(engine, metadata):
+        statements.append(str(CreateIndex(index).compile(dialect=engine.dialect)).strip())
+        if not dry_run:
+            index.create(bind=engine)
+    return statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create indexes missing from an existing database")
+    parser.add_argument("--dry-run", action="store_true", help="print the DDL without running it")
+    args = parser.parse_args()
+
+    from Resturant_Project.config import engine
+    statements = ensure_indexes(engine, dry_run=args.dry_run)
+    for statement in statements:
+        print(statement + ";")
+    if not statements:
+        print("✅ All declared indexes exist.")
+    elif not args.dry_run:
+        print(f"✅ Created {len(statements)} index(es).")
+
+
+if __name__ == "__main__":
+    main()
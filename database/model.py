@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
@@ -53,6 +53,10 @@ class MenuItem(Base):
 # --- ORDERING SYSTEM ---
 class Order(Base):
     __tablename__ = 'order'
+    __table_args__ = (
+        # A user's orders newest first: order history pages and the <bill>/<amount> tags
+        Index('ix_order_user_id_id', 'user_id', 'id'),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('user.id'))  # Linked to user
     status = Column(String(50), default="Pending")  # Paid, Unpaid, Cancelled
@@ -69,6 +73,10 @@ class Order(Base):
 
 class OrderItem(Base):
     __tablename__ = 'order_item'
+    __table_args__ = (
+        # Line items joined onto a page of orders
+        Index('ix_order_item_order_id', 'order_id'),
+    )
     id = Column(Integer, primary_key=True)
     order_id = Column(Integer, ForeignKey('order.id'))
     menu_item_id = Column(Integer, ForeignKey('menu_item.id'))
@@ -132,10 +140,45 @@ class Staff(Base):
 # --- CHAT HISTORY ---
 class ChatHistory(Base):
     __tablename__ = 'chat_history'
+    __table_args__ = (
+        # A user's chat in (timestamp, id) keyset order
+        Index('ix_chat_history_user_ts_id', 'user_id', 'timestamp', 'id'),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('user.id'), nullable=True)
     question = Column(Text)
     answer = Column(Text)
     timestamp = Column(DateTime, default=func.now())
 
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+
+# --- ANALYTICS ROLLUPS ---
+# Maintained incrementally by sales_rollups.record_orders in the same
+# transaction as each order; rebuild with `python -m sales_rollups`.
+# Each key is spread over ROLLUP_SLOTS rows (``slot``) so concurrent orders
+# don't all queue on one row lock; readers sum over the slots.
+class DailyRevenue(Base):
+    __tablename__ = 'daily_revenue'
+    day = Column(Date, primary_key=True)
+    slot = Column(Integer, primary_key=True, default=0)
+    order_count = Column(Integer, default=0)
+    revenue = Column(Float, default=0.0)
+
+
+class DailyItemSales(Base):
+    __tablename__ = 'daily_item_sales'
+    day = Column(Date, primary_key=True)
+    menu_item_id = Column(Integer, ForeignKey('menu_item.id'), primary_key=True)
+    slot = Column(Integer, primary_key=True, default=0)
+    quantity = Column(Integer, default=0)
+    revenue = Column(Float, default=0.0)
+
+
+class DailyPaymentTotals(Base):
+    __tablename__ = 'daily_payment_totals'
+    day = Column(Date, primary_key=True)
+    payment_method = Column(String(50), primary_key=True)  # '' when the order had none
+    slot = Column(Integer, primary_key=True, default=0)
+    order_count = Column(Integer, default=0)
+    revenue = Column(Float, default=0.0)
@@ -0,0 +1,69 @@
+import threading
+from sqlalchemy import event
+
+
+class PoolStats:
+    """Checkout, wait and overflow statistics for an engine's connection pool."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, *args):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, *args):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, *args):
+        with self._lock:
+            self.checkins += 1
+
+    def _on_invalidate(self, *args):
+        with self._lock:
+            self.invalidations += 1
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool
+        with self._lock:
+            stats = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_count": self.waits,
+                "wait_avg_ms": round(self.wait_total / self.waits * 1000, 3) if self.waits else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+        # QueuePool exposes live sizing; other pool classes (e.g. SQLite's) may not
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            fn = getattr(pool, name, None)
+            if callable(fn):
+                stats[name] = fn()
+        stats["status"] = pool.status()
+        return stats
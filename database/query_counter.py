@@ -0,0 +1,76 @@
+import threading
+from contextlib import contextmanager
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Counts SQL statements sent through an engine while active.
+
+    Only statements issued from the thread that entered the counter are
+    recorded, so concurrent requests don't inflate each other's counts.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self.parameters = []
+        self._thread = None
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread:
+            self.statements.append(statement)
+            self.parameters.append(parameters)
+
+    def __enter__(self):
+        self._thread = threading.get_ident()
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return False
+
+
+class ThreadQueryCounts:
+    """Per-thread statement counts from a single engine listener.
+
+    Registered once (at startup) rather than per block, so nothing is added
+    to or removed from the engine while other threads execute. Only threads
+    between ``start`` and ``stop`` are counted.
+    """
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        count = getattr(self._local, "count", None)
+        if count is not None:
+            self._local.count = count + 1
+
+    def start(self) -> None:
+        self._local.count = 0
+
+    @property
+    def count(self) -> int:
+        return getattr(self._local, "count", None) or 0
+
+    def stop(self):
+        """Stop counting this thread; returns its count, or None if it wasn't counting."""
+        count = getattr(self._local, "count", None)
+        self._local.count = None
+        return count
+
+
+@contextmanager
+def assert_max_queries(engine, limit: int, label: str = ""):
+    """Fail with the offending SQL if the block issues more than ``limit`` statements."""
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        sql = "\n\n".join(counter.statements)
+        raise AssertionError(f"{label or 'block'} issued {counter.count} queries (max {limit}):\n{sql}")
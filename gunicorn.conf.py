@@ -0,0 +1,13 @@
+# Pre-fork serving: gunicorn -c gunicorn.conf.py app:app
+# The model is loaded once in the master and shared with workers copy-on-write.
+import json
+import os
+
+bind = os.getenv("BIND", "127.0.0.1:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+preload_app = True
+
+
+def on_starting(server):
+    from model_runtime import preload
+    server.log.info("Model preloaded: %s", json.dumps(preload()))
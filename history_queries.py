@@ -0,0 +1,193 @@
+import base64
+import datetime
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from database.model import ChatHistory, Order, OrderItem, MenuItem
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Rows fetched per round trip when streaming a whole history
+STREAM_BATCH_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# ------------------------------
+# Cursors
+# ------------------------------
+def encode_chat_cursor(chat: ChatHistory) -> str:
+    raw = f"{chat.timestamp.isoformat()}|{chat.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_chat_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, row_id = raw.rsplit("|", 1)
+        return datetime.datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor(f"invalid cursor: {cursor}") from e
+
+
+def decode_order_cursor(cursor: str) -> int:
+    try:
+        return int(cursor)
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor(f"invalid cursor: {cursor}") from e
+
+
+def clamp_limit(limit) -> int:
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+# ------------------------------
+# Chat history, ordered by (timestamp, id) ascending
+# ------------------------------
+def chat_messages(chat: ChatHistory) -> list:
+    timestamp = chat.timestamp.strftime("%Y-%m-%d %H:%M:%S")
+    return [
+        {"sender": "user", "text": chat.question, "timestamp": timestamp},
+        {"sender": "bot", "text": chat.answer, "timestamp": timestamp},
+    ]
+
+
+def _chat_query(db: Session, user_id: int, before=None, after=None):
+    query = db.query(ChatHistory).filter(ChatHistory.user_id == user_id)
+    if after:
+        ts, row_id = decode_chat_cursor(after)
+        query = query.filter(or_(ChatHistory.timestamp > ts,
+                                 and_(ChatHistory.timestamp == ts, ChatHistory.id > row_id)))
+    if before:
+        ts, row_id = decode_chat_cursor(before)
+        query = query.filter(or_(ChatHistory.timestamp < ts,
+                                 and_(ChatHistory.timestamp == ts, ChatHistory.id < row_id)))
+    return query
+
+
+def chat_history_page(db: Session, user_id: int, limit=None, before=None, after=None):
+    """Return (rows oldest first, has_more).
+
+    With ``before`` the page is the ``limit`` rows just older than the cursor;
+    otherwise it is the ``limit`` rows just newer than ``after`` (or the oldest).
+    """
+    limit = clamp_limit(limit)
+    query = _chat_query(db, user_id, before, after)
+    if before and not after:
+        rows = query.order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        return list(reversed(rows[:limit])), has_more
+
+    rows = query.order_by(ChatHistory.timestamp.asc(), ChatHistory.id.asc()).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+
+def iter_chat_history(db: Session, user_id: int, before=None, after=None):
+    """Rows oldest first from a server-side cursor, fetched STREAM_BATCH_SIZE at a time."""
+    query = _chat_query(db, user_id, before, after).order_by(ChatHistory.timestamp.asc(), ChatHistory.id.asc())
+    return query.yield_per(STREAM_BATCH_SIZE)
+
+
+# ------------------------------
+# Order history, ordered by Order.id descending (newest first)
+#
+# Orders, line items and menu names come back from one joined,
+# column-projected query as plain tuples; no ORM objects or lazy
+# relationship loads, so a page costs one round trip however many
+# orders and items it holds.
+# ------------------------------
+_ORDER_HISTORY_COLUMNS = (
+    Order.id,
+    Order.total_amount,
+    Order.payment_method,
+    Order.delivery_address,
+    Order.special_instructions,
+    Order.order_time,
+    OrderItem.id,
+    MenuItem.name,
+    OrderItem.quantity,
+    OrderItem.price_per_unit,
+    OrderItem.customization,
+)
+
+
+def _order_filters(user_id: int, before=None, after=None) -> list:
+    filters = [Order.user_id == user_id]
+    if before:
+        filters.append(Order.id < decode_order_cursor(before))
+    if after:
+        filters.append(Order.id > decode_order_cursor(after))
+    return filters
+
+
+def _joined_order_query(db: Session, order_ids=None, filters=()):
+    query = (
+        db.query(*_ORDER_HISTORY_COLUMNS)
+        .select_from(Order)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(MenuItem, MenuItem.id == OrderItem.menu_item_id)
+    )
+    if order_ids is not None:
+        # A derived table rather than IN (... LIMIT n), which MySQL rejects
+        query = query.join(order_ids, order_ids.c.id == Order.id)
+    return query.filter(*filters).order_by(Order.id.desc(), OrderItem.id.asc())
+
+
+def group_order_rows(rows):
+    """Fold joined (order, item) rows, ordered by order id, into order dicts."""
+    current = None
+    for (order_id, total_amount, payment_method, delivery_address, special_instructions, order_time,
+         item_id, item_name, quantity, price_per_unit, customization) in rows:
+        if current is None or current["order_id"] != order_id:
+            if current is not None:
+                yield current
+            current = {
+                "order_id": order_id,
+                "total_amount": total_amount,
+                "payment_method": payment_method,
+                "delivery_address": delivery_address,
+                "special_instructions": special_instructions,
+                "timestamp": order_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "items": []
+            }
+        if item_id is not None:
+            current["items"].append({
+                "item_name": item_name if item_name is not None else "Unknown",
+                "quantity": quantity,
+                "price_per_unit": price_per_unit,
+                "customization": customization
+            })
+    if current is not None:
+        yield current
+
+
+def order_history_all(db: Session, user_id: int) -> list:
+    return list(group_order_rows(_joined_order_query(db, filters=_order_filters(user_id)).all()))
+
+
+def order_history_page(db: Session, user_id: int, limit=None, before=None, after=None):
+    """Return (order dicts newest first, has_more).
+
+    ``before`` pages towards older orders, ``after`` towards newer ones.
+    """
+    limit = clamp_limit(limit)
+    filters = _order_filters(user_id, before, after)
+    # Pick the page's order ids (limit + 1 to detect more), then join their items
+    id_order = Order.id.asc() if after and not before else Order.id.desc()
+    page_ids = db.query(Order.id).filter(*filters).order_by(id_order).limit(limit + 1).subquery()
+    orders = list(group_order_rows(_joined_order_query(db, page_ids).all()))
+
+    has_more = len(orders) > limit
+    if has_more:
+        # The extra order is the oldest one when paging back, the newest when paging forward
+        orders = orders[1:] if after and not before else orders[:limit]
+    return orders, has_more
+
+
+def iter_order_history(db: Session, user_id: int, before=None, after=None):
+    """Order dicts newest first, streamed from a server-side cursor."""
+    query = _joined_order_query(db, filters=_order_filters(user_id, before, after))
+    return group_order_rows(query.yield_per(STREAM_BATCH_SIZE))
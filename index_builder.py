@@ -0,0 +1,74 @@
+import math
+import time
+import numpy as np
+from Resturant_Project.config import (
+    FAISS_HNSW_M, FAISS_HNSW_EF_CONSTRUCTION, FAISS_HNSW_EF_SEARCH, FAISS_IVF_NLIST, FAISS_IVF_NPROBE, FAISS_PQ_M,
+)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "sq8", "pq")
+
+# FAISS warns below ~39 training points per centroid
+_MIN_POINTS_PER_CENTROID = 39
+
+
+def ivf_nlist(n: int, nlist: int = 0) -> int:
+    if nlist <= 0:
+        nlist = int(4 * math.sqrt(max(n, 1)))
+    return max(1, min(nlist, n // _MIN_POINTS_PER_CENTROID))
+
+
+def pq_params(dim: int, n: int, m: int = FAISS_PQ_M):
+    """(sub-quantizers, bits) that fit the dimension and training set size."""
+    m = max(1, min(m, dim))
+    while dim % m:
+        m -= 1
+    # 2**bits centroids per sub-quantizer need at least that many training vectors
+    nbits = max(1, min(8, int(math.log2(max(n, 2)))))
+    return m, nbits
+
+
+def build_index(kind: str, embeddings: np.ndarray, **params):
+    """Build, train and fill an L2 index of type ``kind`` over ``embeddings``.
+
+    Every type returns squared L2 distances like IndexFlatL2, so search
+    results stay comparable; unknown kinds raise ValueError.
+    """
+    import faiss
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n, dim = embeddings.shape
+
+    if kind == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params.get("hnsw_m", FAISS_HNSW_M))
+        index.hnsw.efConstruction = params.get("ef_construction", FAISS_HNSW_EF_CONSTRUCTION)
+        index.hnsw.efSearch = params.get("ef_search", FAISS_HNSW_EF_SEARCH)
+    elif kind == "ivf":
+        nlist = ivf_nlist(n, params.get("nlist", FAISS_IVF_NLIST))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist, faiss.METRIC_L2)
+        index.nprobe = min(nlist, params.get("nprobe", FAISS_IVF_NPROBE))
+    elif kind == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    elif kind == "pq":
+        m, nbits = pq_params(dim, n, params.get("pq_m", FAISS_PQ_M))
+        index = faiss.IndexPQ(dim, m, nbits, faiss.METRIC_L2)
+    else:
+        raise ValueError(f"unknown index type {kind!r}; expected one of {', '.join(INDEX_TYPES)}")
+
+    if not index.is_trained:
+        index.train(embeddings)
+    index.add(embeddings)
+    return index
+
+
+def timed_build(kind: str, embeddings: np.ndarray, **params):
+    """Return (index, build seconds)."""
+    start = time.perf_counter()
+    index = build_index(kind, embeddings, **params)
+    return index, time.perf_counter() - start
+
+
+def index_nbytes(index) -> int:
+    """Serialized size, which is what sits on disk and in the page cache when mapped."""
+    import faiss
+    return int(faiss.serialize_index(index).nbytes)
@@ -0,0 +1,94 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class InferenceBatcher:
+    """Gathers queries from concurrent requests and runs them as one batch.
+
+    ``batch_fn`` takes a list of queries and returns a list of results in the
+    same order. A background thread waits up to ``window_ms`` after the first
+    query of a batch (or until ``max_batch_size`` queries are queued) before
+    calling it, then hands each result back to the waiting caller.
+
+    With ``workers`` > 1, batches run on a bounded pool of that many threads.
+    The collector only starts a new batch once a worker is free, so queries
+    arriving while every worker is busy pile into the next, larger batch.
+    """
+
+    def __init__(self, batch_fn, window_ms=5.0, max_batch_size=32, workers=1):
+        self.batch_fn = batch_fn
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.workers = max(1, int(workers))
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._executor = None
+        self._slots = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        # Threads don't survive fork, so each (pre-forked) worker process
+        # starts its own batching thread on first use.
+        if self._pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._worker.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                if self.workers > 1:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+                    self._slots = threading.Semaphore(self.workers)
+            self._worker = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+            self._worker.start()
+            self._pid = os.getpid()
+
+    def submit(self, query) -> Future:
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((query, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # Window is over, but take whatever is already waiting
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batch(self, batch):
+        queries = [q for q, _ in batch]
+        try:
+            results = self.batch_fn(queries)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _run_batch_and_release(self, batch):
+        try:
+            self._run_batch(batch)
+        finally:
+            self._slots.release()
+
+    def _run(self):
+        while True:
+            if self._executor is None:
+                self._run_batch(self._collect())
+                continue
+            self._slots.acquire()
+            self._executor.submit(self._run_batch_and_release, self._collect())
@@ -0,0 +1,345 @@
+import hashlib
+import re
+import threading
+import time
+from collections import deque
+import numpy as np
+from sqlalchemy.orm import Session
+from database.model import MenuItem
+from Resturant_Project.config import (
+    MENU_CHECK_INTERVAL,
+    FUZZY_AUTOCORRECT_SCORE,
+    FUZZY_SUGGEST_SCORE,
+    FUZZY_MAX_SUGGESTIONS,
+)
+
+# Words that are not food items
+STOPWORDS = {
+    'i', 'want', 'please', 'order', 'buy', 'can', 'could', 'me', 'to', 'give', 'get',
+    'need', 'would', 'like', 'have', 'some', 'with', 'without', 'and', 'a', 'an', 'just',
+    'll', 'take', 'send', 'serve', 'the', 'of'
+}
+
+# Numbers, words, and any other single non-space character
+_TOKEN = re.compile(r"(\d+)|([a-z]+)|([^\sa-z\d])")
+# Same phrase split the order parser has always used: "2 greek salad", "1 tea"
+_PHRASE = re.compile(r"(\d+)?\s*([a-zA-Z ]+)")
+
+
+def _stem(word: str) -> str:
+    # Just enough to let "2 burgers" match "Burger" and "fries" match "Fries"
+    if len(word) > 3 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list:
+    """Return (token, kind, start, end) tuples; kind is 'num', 'word' or 'sym'."""
+    tokens = []
+    for m in _TOKEN.finditer(text.lower()):
+        if m.group(1):
+            tokens.append((m.group(1), "num", m.start(), m.end()))
+        elif m.group(2):
+            tokens.append((_stem(m.group(2)), "word", m.start(), m.end()))
+        else:
+            tokens.append((m.group(3), "sym", m.start(), m.end()))
+    return tokens
+
+
+# ------------------------------
+# Fuzzy matching
+# ------------------------------
+# Auto-correct only when the best item beats the runner-up by this much
+FUZZY_AUTOCORRECT_MARGIN = 0.1
+
+
+def char_ngrams(text: str, sizes=(2, 3)) -> set:
+    """Character 2- and 3-grams of the stemmed words, padded at the ends."""
+    words = [tok for tok, kind, _, _ in tokenize(text) if kind == "word"]
+    padded = f" {' '.join(words)} "
+    if not words:
+        return set()
+    return {padded[i:i + n] for n in sizes for i in range(len(padded) - n + 1)}
+
+
+class FuzzyMenuIndex:
+    """Character n-gram postings over menu names, stored CSR-style.
+
+    ``indptr[g]:indptr[g + 1]`` slices ``indices`` to the items containing
+    n-gram ``g``. Scoring concatenates the postings of every phrase's
+    n-grams (offset by phrase) and counts overlaps with one ``np.bincount``,
+    giving a phrases x items Dice-similarity matrix without touching names
+    that share nothing with the phrase.
+    """
+
+    def __init__(self, names):
+        self.size = len(names)
+        self.vocab = {}
+        grams_per_item = np.zeros(self.size, dtype=np.float32)
+        gram_ids, item_ids = [], []
+        for pos, name in enumerate(names):
+            grams = char_ngrams(name or "")
+            grams_per_item[pos] = len(grams)
+            for gram in grams:
+                gram_ids.append(self.vocab.setdefault(gram, len(self.vocab)))
+                item_ids.append(pos)
+
+        gram_ids = np.asarray(gram_ids, dtype=np.int64)
+        order = np.argsort(gram_ids, kind="stable")
+        self.indices = np.asarray(item_ids, dtype=np.int64)[order]
+        self.indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(gram_ids, minlength=len(self.vocab)), out=self.indptr[1:])
+        self.grams_per_item = grams_per_item
+
+    def scores(self, phrases) -> np.ndarray:
+        """Dice similarity of each phrase (rows) against every menu item (columns)."""
+        postings = []
+        phrase_sizes = np.zeros(len(phrases), dtype=np.float32)
+        for row, phrase in enumerate(phrases):
+            grams = char_ngrams(phrase)
+            phrase_sizes[row] = len(grams)
+            offset = row * self.size
+            for gram in grams:
+                gram_id = self.vocab.get(gram)
+                if gram_id is not None:
+                    postings.append(self.indices[self.indptr[gram_id]:self.indptr[gram_id + 1]] + offset)
+        flat = np.concatenate(postings) if postings else np.zeros(0, dtype=np.int64)
+        overlap = np.bincount(flat, minlength=len(phrases) * self.size).reshape(len(phrases), self.size)
+        denominator = self.grams_per_item[None, :] + phrase_sizes[:, None]
+        return np.divide(2.0 * overlap, denominator, out=np.zeros(overlap.shape, dtype=np.float32),
+                         where=denominator > 0)
+
+    def top(self, phrases, k=FUZZY_MAX_SUGGESTIONS, min_score=FUZZY_SUGGEST_SCORE) -> list:
+        """Per phrase, up to ``k`` (item position, score) pairs scoring at least ``min_score``, best first."""
+        if not phrases or not self.size:
+            return [[] for _ in phrases]
+        scores = self.scores(phrases)
+        k = min(k, self.size)
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(best):
+            ranked = sorted(((int(pos), float(scores[row, pos])) for pos in candidates), key=lambda c: (-c[1], c[0]))
+            results.append([(pos, score) for pos, score in ranked if score >= min_score])
+        return results
+
+
+class MenuMatcher:
+    """Aho-Corasick automaton over menu-name tokens.
+
+    Built once per menu version; ``parse`` finds every menu name in a single
+    pass over the message, keeps the longest match where names overlap
+    ("chicken burger" over "burger") and binds each match to the nearest
+    preceding quantity.
+    """
+
+    def __init__(self, items, version=0):
+        # items: iterable of dicts with id, name and price
+        self.version = version
+        self.items = list(items)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]  # (pattern length in tokens, item position) ending at each node
+        for pos, item in enumerate(self.items):
+            self._add(pos, [tok for tok, _, _, _ in tokenize(item["name"] or "")])
+        self._link()
+        self._fuzzy = None
+        self._fuzzy_lock = threading.Lock()
+
+    @property
+    def fuzzy(self) -> FuzzyMenuIndex:
+        # Built on the first unmatched phrase, then kept with this menu version
+        if self._fuzzy is None:
+            with self._fuzzy_lock:
+                if self._fuzzy is None:
+                    self._fuzzy = FuzzyMenuIndex([item["name"] for item in self.items])
+        return self._fuzzy
+
+    def _add(self, pos, tokens):
+        if not tokens:
+            return
+        node = 0
+        for tok in tokens:
+            nxt = self._goto[node].get(tok)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][tok] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        # Keep the first item for names that tokenize identically
+        if not any(length == len(tokens) for length, _ in self._out[node]):
+            self._out[node].append((len(tokens), pos))
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for tok, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and tok not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(tok, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, tokens) -> list:
+        """Return non-overlapping (start, end, item position) token spans, leftmost-longest first."""
+        matches = []
+        node = 0
+        for i, (tok, _, _, _) in enumerate(tokens):
+            while node and tok not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(tok, 0)
+            for length, pos in self._out[node]:
+                matches.append((i - length + 1, i + 1, pos))
+
+        matches.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+        chosen = []
+        last_end = 0
+        for start, end, pos in matches:
+            if start >= last_end:
+                chosen.append((start, end, pos))
+                last_end = end
+        return chosen
+
+    def parse(self, query: str):
+        """Return (valid_items, missing_items); missing_items are the unmatched phrases."""
+        valid_items, missing = self._parse(query)
+        return valid_items, [phrase for phrase, _ in missing]
+
+    def parse_with_suggestions(self, query: str):
+        """Like ``parse``, but run missing phrases through the fuzzy index.
+
+        Returns (valid_items, missing_items, corrections, suggestions). A
+        phrase close enough to one item is auto-corrected: the item joins
+        ``valid_items`` (or its quantity is added to the item's existing
+        line) and ``corrections`` gets {"phrase", "name"}. Phrases
+        that stay missing may get {"phrase", "names"} in ``suggestions``.
+        """
+        valid_items, missing = self._parse(query)
+        corrections, suggestions, still_missing = [], [], []
+        lines = {item["menu_item_id"]: item for item in valid_items}
+        ranked_per_phrase = self.fuzzy.top([phrase for phrase, _ in missing]) if missing else []
+        for (phrase, quantity), ranked in zip(missing, ranked_per_phrase):
+            if ranked and ranked[0][1] >= FUZZY_AUTOCORRECT_SCORE and (
+                len(ranked) == 1 or ranked[0][1] - ranked[1][1] >= FUZZY_AUTOCORRECT_MARGIN
+            ):
+                item = self.items[ranked[0][0]]
+                corrections.append({"phrase": phrase, "name": item["name"]})
+                if item["id"] in lines:
+                    lines[item["id"]]["quantity"] += quantity
+                else:
+                    lines[item["id"]] = {
+                        "menu_item_id": item["id"],
+                        "name": item["name"],
+                        "quantity": quantity,
+                        "price_per_unit": item["price"],
+                    }
+                    valid_items.append(lines[item["id"]])
+                continue
+            still_missing.append(phrase)
+            if ranked:
+                suggestions.append({"phrase": phrase, "names": [self.items[pos]["name"] for pos, _ in ranked]})
+        return valid_items, still_missing, corrections, suggestions
+
+    def _parse(self, query: str):
+        """(valid_items, [(missing phrase, quantity)])."""
+        query = query.lower()
+        tokens = tokenize(query)
+        matches = self.find(tokens)
+
+        valid_items = []
+        already_added = set()
+        matched_spans = []
+        prev_end = 0
+        for start, end, pos in matches:
+            # Quantity is the closest number between the previous match and this one
+            quantity = 1
+            for tok, kind, _, _ in tokens[prev_end:start]:
+                if kind == "num":
+                    quantity = int(tok)
+            prev_end = end
+            matched_spans.append((tokens[start][2], tokens[end - 1][3]))
+
+            item = self.items[pos]
+            if item["id"] in already_added:
+                continue
+            already_added.add(item["id"])
+            valid_items.append({
+                "menu_item_id": item["id"],
+                "name": item["name"],
+                "quantity": quantity,
+                "price_per_unit": item["price"],
+            })
+
+        # Phrases that contain no menu name at all are reported as missing
+        missing_items = []
+        quantities = []
+        for m in _PHRASE.finditer(query):
+            phrase_start, phrase_end = m.start(2), m.end(2)
+            if any(s < phrase_end and e > phrase_start for s, e in matched_spans):
+                continue
+            filtered_words = [word for word in m.group(2).strip().split() if word not in STOPWORDS]
+            cleaned_item_name = ' '.join(filtered_words)
+            # Avoid phrases like "give me", "get 1"
+            if len(cleaned_item_name) > 2 and cleaned_item_name not in missing_items:
+                missing_items.append(cleaned_item_name)
+                quantities.append(int(m.group(1)) if m.group(1) else 1)
+
+        return valid_items, list(zip(missing_items, quantities))
+
+
+# ------------------------------
+# Cached matcher for the live menu
+# ------------------------------
+_matcher = None
+_signature = None
+_next_check = 0.0
+_lock = threading.Lock()
+
+
+def menu_items(db: Session) -> list:
+    """The fields the matcher uses, as dicts ordered by id."""
+    return [
+        {"id": item_id, "name": name, "price": price}
+        for item_id, name, price in db.query(MenuItem.id, MenuItem.name, MenuItem.price).order_by(MenuItem.id)
+    ]
+
+
+def menu_signature(items) -> str:
+    """Digest of every item's id, name and price, so any add, removal, rename or reprice changes it."""
+    digest = hashlib.sha1()
+    for item in items:
+        digest.update(f"{item['id']}\0{item['name']}\0{item['price']}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def invalidate_menu() -> None:
+    """Force a rebuild on the next order message (call after editing the menu)."""
+    global _next_check, _signature
+    with _lock:
+        _signature = None
+        _next_check = 0.0
+
+
+def get_menu_matcher(db: Session) -> MenuMatcher:
+    global _matcher, _signature, _next_check
+    now = time.monotonic()
+    if _matcher is not None and now < _next_check:
+        return _matcher
+
+    with _lock:
+        if _matcher is not None and time.monotonic() < _next_check:
+            return _matcher
+        # One narrow query serves both the change check and a rebuild
+        items = menu_items(db)
+        signature = menu_signature(items)
+        if _matcher is None or signature != _signature:
+            version = _matcher.version + 1 if _matcher is not None else 1
+            _matcher = MenuMatcher(items, version)
+            _signature = signature
+        _next_check = time.monotonic() + MENU_CHECK_INTERVAL
+        return _matcher
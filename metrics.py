@@ -0,0 +1,307 @@
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Counter, deque
+from contextlib import contextmanager
+
+# Seconds; wide enough for a cache hit (sub-ms) and a cold encode (seconds)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_str(labelnames, values) -> str:
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _num(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ------------------------------
+# Metric types (Prometheus text exposition format)
+# ------------------------------
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_label_str(self.labelnames, labels)} {_num(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels) -> None:
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, ([*s[0]], s[1], s[2])) for labels, s in self._series.items())
+        names = self.labelnames + ("le",)
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_label_str(names, labels + (_num(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, labels)} {_num(total)}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, labels)} {count}")
+        return lines
+
+
+class CallbackGauge:
+    """Gauge read at scrape time from ``fn``, which returns a number or {label tuple: number}."""
+
+    def __init__(self, name, help_text, fn, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        values = self.fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            if value is not None:
+                lines.append(f"{self.name}{_label_str(self.labelnames, labels)} {_num(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, fn, labelnames=()) -> CallbackGauge:
+        return self.register(CallbackGauge(name, help_text, fn, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    "chat_stage_seconds", "Time spent in each stage of answering a chat message.", ("stage",)
+)
+request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route.", ("method", "route")
+)
+requests_total = registry.counter(
+    "http_requests_total", "Requests handled, by route and status code.", ("method", "route", "status")
+)
+request_errors_total = registry.counter(
+    "http_request_errors_total", "Requests that raised or returned a 5xx status.", ("method", "route")
+)
+
+
+# ------------------------------
+# Per-request traces
+# ------------------------------
+class RequestTrace:
+    __slots__ = ("method", "route", "start", "stages", "samples", "status", "duration")
+
+    def __init__(self, method, route):
+        self.method = method
+        self.route = route
+        self.start = time.perf_counter()
+        self.stages = []  # (stage, seconds) in completion order
+        self.samples = _Counter()  # collapsed stack -> sample count
+        self.status = None
+        self.duration = None
+
+    def to_dict(self, top_stacks=20) -> dict:
+        return {
+            "method": self.method,
+            "route": self.route,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 3),
+            "stages": [{"stage": s, "ms": round(d * 1000, 3)} for s, d in self.stages],
+            "samples": [{"stack": stack, "count": n} for stack, n in self.samples.most_common(top_stacks)],
+        }
+
+
+_local = threading.local()
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block into chat_stage_seconds and the current request's trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, name)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.stages.append((name, elapsed))
+
+
+def start_request(method: str, route: str) -> RequestTrace:
+    trace = RequestTrace(method, route)
+    _local.trace = trace
+    if profiler is not None:
+        profiler.watch(trace)
+    return trace
+
+
+def end_request(status=None, error=False):
+    """Finish the current thread's trace and record its metrics; returns the trace or None."""
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return None
+    _local.trace = None
+    trace.duration = time.perf_counter() - trace.start
+    trace.status = status if status is not None else (500 if error else None)
+    request_seconds.observe(trace.duration, trace.method, trace.route)
+    requests_total.inc(trace.method, trace.route, str(trace.status))
+    if error or (trace.status is not None and trace.status >= 500):
+        request_errors_total.inc(trace.method, trace.route)
+    if profiler is not None:
+        profiler.finish(trace)
+    return trace
+
+
+# ------------------------------
+# Sampling profiler for slow requests
+# ------------------------------
+def _collapse(frame, max_depth=64) -> str:
+    parts = []
+    while frame is not None and len(parts) < max_depth:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class SlowRequestProfiler:
+    """Samples the stacks of in-flight request threads every ``interval_ms``.
+
+    Requests slower than ``threshold_ms`` keep their stage timings and
+    collapsed stack samples: the last ``keep`` in memory, and one JSON file
+    each under ``out_dir`` when it's set.
+    """
+
+    def __init__(self, threshold_ms, interval_ms=5.0, out_dir=None, keep=50):
+        self.threshold = float(threshold_ms) / 1000.0
+        self.interval = max(0.001, float(interval_ms) / 1000.0)
+        self.out_dir = out_dir
+        self.recent = deque(maxlen=keep)
+        self._active = {}  # thread id -> trace
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.dumped = 0
+
+    def _ensure_sampler(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._active = {}
+            self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def watch(self, trace) -> None:
+        self._ensure_sampler()
+        with self._lock:
+            self._active[threading.get_ident()] = trace
+
+    def finish(self, trace) -> None:
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+        if trace.duration < self.threshold:
+            return
+        record = trace.to_dict()
+        record["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.recent.append(record)
+        if self.out_dir:
+            os.makedirs(self.out_dir, exist_ok=True)
+            name = f"slow-{time.strftime('%Y%m%d-%H%M%S')}-{threading.get_ident()}-{self.dumped}.json"
+            with open(os.path.join(self.out_dir, name), "w", encoding="utf-8") as f:
+                json.dump(record, f, indent=2)
+        self.dumped += 1
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.items())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for ident, trace in active:
+                frame = frames.get(ident)
+                if frame is not None:
+                    trace.samples[_collapse(frame)] += 1
+
+    def stats(self) -> dict:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "interval_ms": self.interval * 1000,
+            "out_dir": self.out_dir,
+            "slow_requests": self.dumped,
+            "recent": list(self.recent),
+        }
+
+
+profiler = None
+
+
+def enable_profiler(threshold_ms, interval_ms=5.0, out_dir=None, keep=50) -> SlowRequestProfiler:
+    global profiler
+    profiler = SlowRequestProfiler(threshold_ms, interval_ms, out_dir, keep)
+    return profiler
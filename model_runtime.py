@@ -0,0 +1,385 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from answer_store import (
+    open_answer_store, load_question_lookup, write_answer_store, write_question_lookup,
+    ANSWER_OFFSETS_FILE, ANSWER_BLOB_FILE, QUESTION_LOOKUP_FILE,
+)
+from answer_templates import compile_answer_store
+from Resturant_Project.config import MODEL_RELOAD_CHECK_INTERVAL, MODEL_MAX_SHARDS, MODEL_SHARD_MEMORY_MB
+
+ENCODER_NAME = 'all-MiniLM-L6-v2'
+MODEL_DIR = "model"
+INDEX_FILE = "model.index"
+QUESTION_TEXTS_FILE = "question_texts.npy"
+QA_FILE = "restaurant_qa.csv"
+
+# train_model.py publishes each build to model/releases/<version>/ and then
+# atomically rewrites model/CURRENT to name it. Trees trained before that
+# keep their artifacts directly in model/.
+RELEASES_DIR = "releases"
+CURRENT_FILE = "CURRENT"
+
+# Per-restaurant builds live in model/shards/<restaurant_id>/, each laid out
+# like model/ itself (releases/ + CURRENT). Restaurants without a shard are
+# answered from the default build.
+SHARDS_DIR = "shards"
+
+
+def current_release(model_dir=MODEL_DIR):
+    """Return (version, artifact_dir) for the published build."""
+    try:
+        with open(os.path.join(model_dir, CURRENT_FILE), encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        version = ""
+    if not version:
+        return "legacy", model_dir
+    return version, os.path.join(model_dir, RELEASES_DIR, version)
+
+
+def shard_dir(restaurant_id, model_dir=MODEL_DIR) -> str:
+    return os.path.join(model_dir, SHARDS_DIR, str(int(restaurant_id)))
+
+
+def artifact_nbytes(artifact_dir) -> int:
+    """Bytes of the files a build maps or loads (index, answers, lookup)."""
+    total = 0
+    for name in os.listdir(artifact_dir):
+        path = os.path.join(artifact_dir, name)
+        if os.path.isfile(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def read_index_mmap(path):
+    """Read a FAISS index memory-mapped, falling back to a normal read.
+
+    A mapped index is backed by the page cache, so pre-forked workers share
+    the same physical pages instead of each holding a private copy.
+    """
+    import faiss
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+class Artifacts:
+    """One loaded build (index, answer table, lookups), never modified once built.
+
+    A reload builds a new Artifacts and swaps the reference, so a reader
+    holding one for a whole batch can't pair row ids from one build with
+    answers from another.
+    """
+
+    def __init__(self, version, index, answer_store, question_lookup, templates, nbytes, restaurant_id=None):
+        self.restaurant_id = restaurant_id
+        self.version = version
+        self.index = index
+        self.answer_store = answer_store
+        self.question_lookup = question_lookup
+        # Compiled answer per index row; what search and exact hits return
+        self.templates = templates
+        self.nbytes = nbytes
+
+
+class Shard(Artifacts):
+    """One restaurant's loaded build."""
+
+    def __init__(self, restaurant_id, *artifacts):
+        super().__init__(*artifacts, restaurant_id=restaurant_id)
+        self.next_check = time.monotonic() + MODEL_RELOAD_CHECK_INTERVAL
+
+
+def migrate_legacy_build(model_dir=MODEL_DIR) -> None:
+    """Give a build from before releases/ (model.index and question_texts.npy
+    directly in ``model_dir``) its answer table and question lookup.
+
+    Answers come from ``model_dir``/restaurant_qa.csv, first answer per
+    question as the old DataFrame lookup did; nothing is re-encoded. Does
+    nothing for published releases or a build that already has the table.
+    """
+    version, artifact_dir = current_release(model_dir)
+    if version != "legacy" or os.path.exists(os.path.join(artifact_dir, ANSWER_OFFSETS_FILE)):
+        return
+    qa_path = os.path.join(model_dir, QA_FILE)
+    if not os.path.exists(qa_path):
+        raise FileNotFoundError(
+            f"{model_dir}/ holds a legacy build without a compiled answer table and {qa_path} "
+            "is missing to migrate it from. Add the CSV or run train_model.py."
+        )
+    import pandas as pd  # only needed for this one-off migration
+
+    question_texts = np.load(os.path.join(artifact_dir, QUESTION_TEXTS_FILE), allow_pickle=True).tolist()
+    df = pd.read_csv(qa_path)
+    first_answer = {}
+    for question, answer in zip(df['Question'], df['Answer']):
+        first_answer.setdefault(question, answer)
+    missing = [q for q in question_texts if q not in first_answer]
+    if missing:
+        raise ValueError(f"{len(missing)} indexed questions are not in {qa_path}, e.g. {missing[0]!r}; "
+                         "run train_model.py to rebuild")
+    write_answer_store(
+        [first_answer[q] for q in question_texts],
+        os.path.join(artifact_dir, ANSWER_OFFSETS_FILE),
+        os.path.join(artifact_dir, ANSWER_BLOB_FILE),
+    )
+    write_question_lookup(question_texts, os.path.join(artifact_dir, QUESTION_LOOKUP_FILE))
+
+
+def load_artifacts(model_dir, timed=None):
+    """Return (version, index, answer store, question lookup, templates, bytes) for a build."""
+    timed = timed or (lambda stage, fn: fn())
+    migrate_legacy_build(model_dir)
+    version, artifact_dir = current_release(model_dir)
+    index = timed("index", lambda: read_index_mmap(os.path.join(artifact_dir, INDEX_FILE)))
+    store = timed("answers", lambda: open_answer_store(artifact_dir))
+    lookup = timed("question_lookup", lambda: load_question_lookup(os.path.join(artifact_dir, QUESTION_LOOKUP_FILE)))
+    templates = timed("templates", lambda: compile_answer_store(store))
+    return version, index, store, lookup, templates, artifact_nbytes(artifact_dir)
+
+
+class ShardCache:
+    """Per-restaurant builds, loaded on first use and evicted least recently used.
+
+    ``get`` returns None for a restaurant without a shard so the caller can
+    fall back to the default build. Each shard hot-reloads on its own when
+    train_model.py publishes a new release into its directory.
+
+    Ids are first checked against a listing of model/shards/ taken once per
+    reload interval, so ids without a shard directory (e.g. a client
+    cycling through arbitrary ids) cost no filesystem access and leave no
+    per-id state behind.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, max_shards=MODEL_MAX_SHARDS, max_mb=MODEL_SHARD_MEMORY_MB,
+                 on_reload=None):
+        self.model_dir = model_dir
+        self.max_shards = max(1, int(max_shards))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.on_reload = on_reload
+        self._shards = OrderedDict()  # restaurant_id -> Shard, least recently used first
+        self._missing = {}  # restaurant_id -> monotonic time to look again
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._shard_ids = frozenset()  # directories under model/shards/
+        self._next_listing = 0.0
+        self.loads = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    def _load(self, restaurant_id):
+        directory = shard_dir(restaurant_id, self.model_dir)
+        _, artifact_dir = current_release(directory)
+        if not os.path.exists(os.path.join(artifact_dir, INDEX_FILE)):
+            return None
+        return Shard(restaurant_id, *load_artifacts(directory))
+
+    def _insert(self, shard):
+        with self._lock:
+            self._shards[shard.restaurant_id] = shard
+            self._shards.move_to_end(shard.restaurant_id)
+            # Always keep the shard just loaded, even if it alone is over budget
+            while len(self._shards) > 1 and (
+                len(self._shards) > self.max_shards or self.resident_bytes() > self.max_bytes
+            ):
+                self._shards.popitem(last=False)
+                self.evictions += 1
+
+    def _has_shard_dir(self, restaurant_id, now) -> bool:
+        """Whether model/shards/<restaurant_id>/ existed at the last listing; call with _lock held."""
+        if now >= self._next_listing:
+            try:
+                names = os.listdir(os.path.join(self.model_dir, SHARDS_DIR))
+            except FileNotFoundError:
+                names = []
+            self._shard_ids = frozenset(int(name) for name in names if name.isdigit())
+            # With reloads off, shards published later are picked up on restart
+            self._next_listing = now + MODEL_RELOAD_CHECK_INTERVAL if MODEL_RELOAD_CHECK_INTERVAL > 0 else float("inf")
+        return restaurant_id in self._shard_ids
+
+    def resident_bytes(self) -> int:
+        return sum(shard.nbytes for shard in self._shards.values())
+
+    def get(self, restaurant_id):
+        now = time.monotonic()
+        with self._lock:
+            shard = self._shards.get(restaurant_id)
+            if shard is not None:
+                self._shards.move_to_end(restaurant_id)
+            elif not self._has_shard_dir(restaurant_id, now) or self._missing.get(restaurant_id, 0.0) > now:
+                return None
+            load_lock = self._load_locks.setdefault(restaurant_id, threading.Lock())
+
+        if shard is not None and (MODEL_RELOAD_CHECK_INTERVAL <= 0 or now < shard.next_check):
+            return shard
+
+        with load_lock:
+            if shard is not None:
+                shard.next_check = time.monotonic() + MODEL_RELOAD_CHECK_INTERVAL
+                version, _ = current_release(shard_dir(restaurant_id, self.model_dir))
+                if version == shard.version:
+                    return shard
+                fresh = self._load(restaurant_id)
+                if fresh is None:
+                    return shard
+                self.reloads += 1
+                self._insert(fresh)
+                if self.on_reload is not None:
+                    self.on_reload()
+                return fresh
+
+            with self._lock:
+                shard = self._shards.get(restaurant_id)
+            if shard is not None:
+                return shard
+            shard = self._load(restaurant_id)
+            if shard is None:
+                with self._lock:
+                    self._missing[restaurant_id] = time.monotonic() + MODEL_RELOAD_CHECK_INTERVAL
+                return None
+            self.loads += 1
+            self._insert(shard)
+            return shard
+
+    def stats(self) -> dict:
+        with self._lock:
+            resident = [
+                {"restaurant_id": s.restaurant_id, "version": s.version, "bytes": s.nbytes,
+                 "index_vectors": s.index.ntotal}
+                for s in reversed(self._shards.values())
+            ]
+            resident_bytes = self.resident_bytes()
+        return {
+            "max_shards": self.max_shards,
+            "max_bytes": self.max_bytes,
+            "resident_bytes": resident_bytes,
+            "loads": self.loads,
+            "reloads": self.reloads,
+            "evictions": self.evictions,
+            "resident": resident,
+        }
+
+
+class ModelRuntime:
+    """Encoder, FAISS index and answer artifacts, loaded on first use.
+
+    Nothing heavy happens at import time. ``ensure_loaded()`` is called by the
+    chat path on the first request; a pre-fork server calls ``preload()``
+    in the master instead so every worker inherits the loaded state.
+    """
+
+    def __init__(self, encoder_name=ENCODER_NAME, model_dir=MODEL_DIR):
+        self.encoder_name = encoder_name
+        self.model_dir = model_dir
+        self.encoder = None
+        # The default build; replaced as a whole, never modified in place
+        self.artifacts = None
+        self.load_times = {}
+        self.loaded = False
+        # Called after the artifacts are swapped (e.g. to clear caches)
+        self.reload_hooks = []
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self.shards = ShardCache(model_dir, on_reload=self._run_reload_hooks)
+
+    def _timed(self, stage, fn):
+        start = time.perf_counter()
+        result = fn()
+        self.load_times[stage] = round(time.perf_counter() - start, 4)
+        return result
+
+    @property
+    def version(self):
+        artifacts = self.artifacts
+        return artifacts.version if artifacts is not None else None
+
+    def _load_artifacts(self) -> Artifacts:
+        return Artifacts(*load_artifacts(self.model_dir, self._timed))
+
+    def _run_reload_hooks(self):
+        for hook in self.reload_hooks:
+            hook()
+
+    def ensure_loaded(self):
+        if self.loaded:
+            return self
+        with self._lock:
+            if self.loaded:
+                return self
+            start = time.perf_counter()
+            self._timed("import_faiss", lambda: __import__("faiss"))
+            st = self._timed("import_sentence_transformers", lambda: __import__("sentence_transformers"))
+            self.encoder = self._timed("encoder", lambda: st.SentenceTransformer(self.encoder_name))
+            self.artifacts = self._load_artifacts()
+            self.load_times["total"] = round(time.perf_counter() - start, 4)
+            self._next_check = time.monotonic() + MODEL_RELOAD_CHECK_INTERVAL
+            self.loaded = True
+        return self
+
+    def reload_artifacts(self):
+        """Swap in freshly trained index/answer files; the encoder is kept."""
+        if not self.loaded:
+            return self.ensure_loaded()
+        artifacts = self._load_artifacts()
+        with self._lock:
+            self.artifacts = artifacts
+        self._run_reload_hooks()
+        return self
+
+    def maybe_reload(self):
+        """Hot-reload if train_model.py has published a new build since the last check."""
+        if MODEL_RELOAD_CHECK_INTERVAL <= 0 or time.monotonic() < self._next_check:
+            return self
+        self._next_check = time.monotonic() + MODEL_RELOAD_CHECK_INTERVAL
+        version, _ = current_release(self.model_dir)
+        if version != self.version:
+            self.reload_artifacts()
+        return self
+
+    def artifacts_for(self, restaurant_id=None):
+        """The build answering ``restaurant_id``: its shard if it has one, else the default.
+
+        Callers keep the returned Artifacts for the whole request or batch.
+        """
+        default = self.artifacts
+        if restaurant_id is None:
+            return default
+        return self.shards.get(restaurant_id) or default
+
+    def startup_report(self) -> dict:
+        artifacts = self.artifacts
+        return {
+            "loaded": self.loaded,
+            "pid": os.getpid(),
+            "version": artifacts.version if artifacts is not None else None,
+            "seconds": dict(self.load_times),
+            "index_vectors": artifacts.index.ntotal if artifacts is not None else 0,
+            "user_tag_answers": sum(1 for t in artifacts.templates if t.user_tags) if artifacts is not None else 0,
+            "shards": self.shards.stats(),
+        }
+
+
+runtime = ModelRuntime()
+
+
+def get_runtime() -> ModelRuntime:
+    return runtime.ensure_loaded().maybe_reload()
+
+
+def preload() -> dict:
+    """Load everything now (e.g. in a pre-fork master) and return the timing report."""
+    import gc
+    runtime.ensure_loaded()
+    # Move everything loaded so far out of the GC's reach so collections in
+    # forked workers don't touch (and copy) these pages.
+    gc.freeze()
+    return runtime.startup_report()
+
+
+if __name__ == "__main__":
+    import json
+    print(json.dumps(preload(), indent=2))
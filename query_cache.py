@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+from text_utils import normalize_query
+
+
+class QueryCache:
+    """Bounded LRU cache with a TTL, keyed on the normalized query text.
+
+    Stores the template answer returned by the retriever (before tags are
+    filled in), so cached entries stay valid while DB data changes. Call
+    ``invalidate()`` whenever the index is retrained or reloaded.
+
+    ``namespace`` keeps answers from different restaurants' indexes apart;
+    None is the default index.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600.0):
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped on invalidate() so answers computed against the old index
+        # can't be written back afterwards
+        self.generation = 0
+
+    @staticmethod
+    def _key(query: str, namespace=None):
+        key = normalize_query(query)
+        return key if namespace is None else (namespace, key)
+
+    def get(self, query: str, namespace=None):
+        if self.maxsize <= 0:
+            return None
+        key = self._key(query, namespace)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (self.ttl > 0 and now - entry[1] > self.ttl):
+                if entry is not None:
+                    del self._data[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, query: str, value, generation=None, namespace=None) -> None:
+        if self.maxsize <= 0:
+            return
+        key = self._key(query, namespace)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._data)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
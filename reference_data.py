@@ -0,0 +1,225 @@
+import itertools
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database.model import RestaurantInfo, MenuItem, Service, Platform, Policy, Staff
+from Resturant_Project.config import REFERENCE_DATA_TTL
+
+REFERENCE_TABLES = frozenset(model.__table__ for model in (RestaurantInfo, MenuItem, Service, Platform, Policy, Staff))
+
+
+class ReferenceSnapshot:
+    """In-memory copy of the rarely changing tables, with every tag pre-rendered.
+
+    ``tags`` maps a tag name (without the angle brackets) to its final text,
+    so substituting a shared tag never touches the DB. ``restaurant`` and
+    ``menu`` keep the raw rows as plain dicts. There is one snapshot per
+    restaurant; only the restaurant row differs between them, as the menu,
+    services, platforms, policies and staff tables are shared by all.
+    """
+
+    def __init__(self, version, restaurant, shared, restaurant_id=None):
+        self.version = version
+        self.restaurant_id = restaurant_id
+        self.loaded_at = time.time()
+        self.restaurant = restaurant
+        self.menu = shared.menu
+        self.shared = shared  # fresh for as long as the shared tables it was rendered from
+        self.tags = render_tags(restaurant, shared.menu, shared.services, shared.platforms, shared.policies,
+                                shared.staff)
+
+
+def render_tags(info, menu, services, platforms, policies, staff) -> dict:
+    return {
+        "menuitem": "\n".join([f"🍽 {item['name']} - Rs {item['price']}" for item in menu]) or "No menu items available.",
+        "location": f"📍 {info['name']}, {info['address']}" if info else "Location not found.",
+        "contact": f"📞 {info['contact']}" if info else "Contact info not available.",
+        "email": f"📧 {info['email']}" if info else "Email not available.",
+        "name": info['name'] if info else "Name not available.",
+        "wifi": "✅ Available" if info and info['wifi'] else "❌ Not Available",
+        "parking": "✅ Available" if info and info['parking'] else "❌ Not Available",
+        "service": ", ".join([name.capitalize() for name in services]) or "No active services.",
+        "platform": ", ".join(platforms) or "No available platforms.",
+        "policy": "\n".join([f"{name.replace('_',' ').title()}: {value}" for name, value in policies]) or "No policies available.",
+        "staff": "\n".join([f"{role.title()}: {name}" for role, name in staff]) or "No staff listed.",
+    }
+
+
+def restaurant_to_dict(info: RestaurantInfo) -> dict:
+    return {
+        "id": info.id,
+        "name": info.name,
+        "address": info.address,
+        "contact": info.contact,
+        "email": info.email,
+        "wifi": info.wifi,
+        "parking": info.parking,
+        "opening_hours": info.opening_hours,
+        "closing_time": info.closing_time,
+        "weekend_hours": info.weekend_hours,
+        "delivery_time": info.delivery_time,
+        "capacity": info.capacity,
+    }
+
+
+class SharedData:
+    """The reference tables every restaurant shares, plus the ids of the restaurant rows.
+
+    Only ``restaurant_info`` is per restaurant; menu, services, platforms,
+    policies and staff have no restaurant column, so all snapshots render
+    them from this one load.
+    """
+
+    def __init__(self, restaurant_ids, first_restaurant_id, menu, services, platforms, policies, staff):
+        self.restaurant_ids = restaurant_ids
+        self.first_restaurant_id = first_restaurant_id
+        self.menu = menu
+        self.services = services
+        self.platforms = platforms
+        self.policies = policies
+        self.staff = staff
+        self.expires_at = time.monotonic() + REFERENCE_DATA_TTL
+
+
+def load_shared(db: Session) -> SharedData:
+    restaurant_ids = [rid for (rid,) in db.query(RestaurantInfo.id).order_by(RestaurantInfo.id).all()]
+    menu = [
+        {
+            "id": item.id,
+            "name": item.name,
+            "description": item.description,
+            "category": item.category,
+            "price": item.price,
+        }
+        for item in db.query(MenuItem).all()
+    ]
+    services = [name for (name,) in db.query(Service.name).filter_by(enabled=True).all()]
+    platforms = [name for (name,) in db.query(Platform.name).filter_by(available=True).all()]
+    policies = [tuple(p) for p in db.query(Policy.name, Policy.value).all()]
+    staff = [tuple(s) for s in db.query(Staff.role, Staff.name).all()]
+    return SharedData(
+        frozenset(restaurant_ids),
+        restaurant_ids[0] if restaurant_ids else None,
+        menu, services, platforms, policies, staff,
+    )
+
+
+def load_snapshot(db: Session, version: int, shared: SharedData, restaurant_id=None) -> ReferenceSnapshot:
+    """Snapshot for ``restaurant_id``; None means the first (single-restaurant) row.
+
+    Ids without a restaurant row get a snapshot without one, at no query.
+    """
+    row_id = shared.first_restaurant_id if restaurant_id is None else restaurant_id
+    info = db.get(RestaurantInfo, row_id) if row_id in shared.restaurant_ids else None
+    return ReferenceSnapshot(version, restaurant_to_dict(info) if info else None, shared, restaurant_id)
+
+
+# Ids with no restaurant row all share this key, so a client cycling
+# through arbitrary ids neither grows the cache nor forces reloads
+_UNKNOWN = "unknown"
+
+_shared = None
+_snapshots = {}  # restaurant_id (or _UNKNOWN) -> snapshot, fresh until its shared data expires
+_version = 0  # Shared counter, so versions never repeat across restaurants
+_lock = threading.Lock()  # guards _shared, _version and _load_locks; never held over a query
+_shared_lock = threading.Lock()
+_load_locks = {}  # snapshot key -> lock, one per known restaurant
+
+
+def invalidate_reference_data() -> None:
+    """Reload on next use; call after changing restaurant, menu, service, platform, policy or staff rows."""
+    with _lock:
+        if _shared is not None:
+            _shared.expires_at = 0.0
+
+
+def _fresh_shared():
+    shared = _shared
+    if shared is not None and time.monotonic() < shared.expires_at:
+        return shared
+    return None
+
+
+def _key(shared, restaurant_id):
+    if restaurant_id is None or restaurant_id in shared.restaurant_ids:
+        return restaurant_id
+    return _UNKNOWN
+
+
+def peek_snapshot(restaurant_id=None):
+    """The restaurant's snapshot if it's still fresh, else None; never touches the DB."""
+    shared = _fresh_shared()
+    if shared is None:
+        return None
+    snapshot = _snapshots.get(_key(shared, restaurant_id))
+    if snapshot is not None and snapshot.shared is shared:
+        return snapshot
+    return None
+
+
+def _get_shared(db: Session) -> SharedData:
+    global _shared
+    shared = _fresh_shared()
+    if shared is not None:
+        return shared
+    with _shared_lock:
+        shared = _fresh_shared()
+        if shared is None:
+            shared = load_shared(db)
+            with _lock:
+                _shared = shared
+        return shared
+
+
+def get_snapshot(db: Session, restaurant_id=None) -> ReferenceSnapshot:
+    global _version
+    snapshot = peek_snapshot(restaurant_id)
+    if snapshot is not None:
+        return snapshot
+    shared = _get_shared(db)
+    key = _key(shared, restaurant_id)
+    with _lock:
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+    with load_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None or snapshot.shared is not shared:
+            with _lock:
+                _version += 1
+                version = _version
+            snapshot = load_snapshot(db, version, shared, key)
+            _snapshots[key] = snapshot
+        return snapshot
+
+
+def track_reference_writes(session_factory, *on_change) -> None:
+    """Invalidate the snapshots (then call each ``on_change``) whenever a
+    session from ``session_factory`` commits a change to a reference table.
+
+    Covers ORM flushes and ORM insert/update/delete statements. Only this
+    process sees the commit; writes from other processes or raw SQL show up
+    after REFERENCE_DATA_TTL.
+    """
+    @event.listens_for(session_factory, "after_flush")
+    def _mark_flush(session, flush_context):
+        changed = itertools.chain(session.new, session.dirty, session.deleted)
+        if any(getattr(obj, "__table__", None) in REFERENCE_TABLES for obj in changed):
+            session.info["reference_changed"] = True
+
+    @event.listens_for(session_factory, "do_orm_execute")
+    def _mark_statement(state):
+        if state.is_select or state.bind_mapper is None:
+            return
+        if state.bind_mapper.local_table in REFERENCE_TABLES:
+            state.session.info["reference_changed"] = True
+
+    @event.listens_for(session_factory, "after_commit")
+    def _invalidate(session):
+        if session.info.pop("reference_changed", False):
+            invalidate_reference_data()
+            for callback in on_change:
+                callback()
+
+    @event.listens_for(session_factory, "after_rollback")
+    def _discard(session):
+        session.info.pop("reference_changed", None)
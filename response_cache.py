@@ -0,0 +1,65 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class CachedResponse:
+    __slots__ = ("body", "status", "etag")
+
+    def __init__(self, body: bytes, status: int):
+        self.body = body
+        self.status = status
+        # Strong validator: a digest of the exact bytes sent
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+
+
+class ResponseCache:
+    """Serialized response bodies keyed by (route key, data version).
+
+    ``render`` only runs when a key hasn't been rendered for the current
+    data version, so polling clients get the same bytes (and ETag) until
+    the underlying rows change. Bounded LRU so arbitrary query-string
+    combinations can't grow it without limit.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = int(maxsize)
+        self._data = OrderedDict()  # key -> (version, CachedResponse)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, render) -> CachedResponse:
+        """Return the cached response for ``key`` at ``version``; ``render()`` returns (body bytes, status)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] == version:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        body, status = render()
+        response = CachedResponse(body, status)
+        with self._lock:
+            self._data[key] = (version, response)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return response
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._data)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
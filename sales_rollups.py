@@ -0,0 +1,274 @@
+"""Daily sales rollups, kept current as orders are written.
+
+Every order write path (place_order, create_order, bulk import) passes its
+new orders to ``record_orders`` before committing, so the rollup rows
+change in the same transaction as the orders themselves. Each call adds
+into one of ROLLUP_SLOTS rows per key (``rollup_slot``), so orders placed
+at the same time rarely wait on each other's row locks. The analytics API
+reads only these tables, summing over the slots.
+
+Rebuild them from existing orders (e.g. after first deploying this) with:
+
+    python -m sales_rollups --chunk-size 5000
+"""
+import argparse
+import datetime
+from sqlalchemy import delete, func, update, insert
+from sqlalchemy.orm import Session
+from database.model import Order, OrderItem, DailyRevenue, DailyItemSales, DailyPaymentTotals
+from Resturant_Project.config import ROLLUP_SLOTS
+
+DEFAULT_BACKFILL_CHUNK = 5000
+# Orders just below the scan's high id that are read again at the swap, in
+# case they had their id but hadn't committed when the scan passed them
+DEFAULT_BACKFILL_RESCAN = 1000
+
+
+# ------------------------------
+# Aggregation
+# ------------------------------
+def order_row(order_time, total_amount, payment_method, items) -> tuple:
+    """The shape record_orders takes; items are (menu_item_id, quantity, price_per_unit)."""
+    return order_time, total_amount, payment_method, items
+
+
+def aggregate(orders) -> tuple:
+    """Fold order rows into (revenue, item, payment) deltas keyed by their rollup primary keys."""
+    revenue, items, payments = {}, {}, {}
+    for order_time, total_amount, payment_method, order_items in orders:
+        day = (order_time or datetime.datetime.now()).date()
+        total = float(total_amount or 0.0)
+        count, amount = revenue.get(day, (0, 0.0))
+        revenue[day] = (count + 1, amount + total)
+
+        key = (day, payment_method or "")
+        count, amount = payments.get(key, (0, 0.0))
+        payments[key] = (count + 1, amount + total)
+
+        for menu_item_id, quantity, price_per_unit in order_items:
+            key = (day, menu_item_id)
+            qty, amount = items.get(key, (0, 0.0))
+            items[key] = (qty + (quantity or 0), amount + (quantity or 0) * float(price_per_unit or 0.0))
+    return revenue, items, payments
+
+
+def merge(totals: tuple, deltas: tuple) -> None:
+    """Add one aggregate() result into another, in place."""
+    for into, source in zip(totals, deltas):
+        for key, values in source.items():
+            current = into.get(key)
+            into[key] = values if current is None else tuple(a + b for a, b in zip(current, values))
+
+
+def rollup_slot(order_id) -> int:
+    return int(order_id) % ROLLUP_SLOTS if ROLLUP_SLOTS > 1 else 0
+
+
+# ------------------------------
+# Incremental upserts
+# ------------------------------
+def _upsert_add(db: Session, model, key_columns, rows) -> None:
+    """Insert ``rows`` or add their value columns onto existing rows with the same key."""
+    if not rows:
+        return
+    value_columns = [name for name in rows[0] if name not in key_columns]
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={name: getattr(model, name) + stmt.excluded[name] for name in value_columns},
+        )
+        db.execute(stmt)
+        return
+
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(model).values(rows)
+        stmt = stmt.on_duplicate_key_update({name: getattr(model, name) + stmt.inserted[name] for name in value_columns})
+        db.execute(stmt)
+        return
+
+    # Anything else: update in place, insert the rows that weren't there
+    for row in rows:
+        match = [getattr(model, name) == row[name] for name in key_columns]
+        result = db.execute(
+            update(model).where(*match).values({name: getattr(model, name) + row[name] for name in value_columns})
+        )
+        if result.rowcount == 0:
+            db.execute(insert(model).values(row))
+
+
+def rollup_rows(revenue: dict, items: dict, payments: dict, slot=0) -> tuple:
+    """(revenue rows, item rows, payment rows) for the three rollup tables, in key order."""
+    return (
+        [{"day": day, "slot": slot, "order_count": count, "revenue": amount}
+         for day, (count, amount) in sorted(revenue.items())],
+        [{"day": day, "menu_item_id": menu_item_id, "slot": slot, "quantity": qty, "revenue": amount}
+         for (day, menu_item_id), (qty, amount) in sorted(items.items())],
+        [{"day": day, "payment_method": method, "slot": slot, "order_count": count, "revenue": amount}
+         for (day, method), (count, amount) in sorted(payments.items())],
+    )
+
+
+def apply_deltas(db: Session, revenue: dict, items: dict, payments: dict, slot=0) -> None:
+    revenue_rows, item_rows, payment_rows = rollup_rows(revenue, items, payments, slot)
+    _upsert_add(db, DailyRevenue, ("day", "slot"), revenue_rows)
+    _upsert_add(db, DailyItemSales, ("day", "menu_item_id", "slot"), item_rows)
+    _upsert_add(db, DailyPaymentTotals, ("day", "payment_method", "slot"), payment_rows)
+
+
+def record_orders(db: Session, orders, slot=0) -> None:
+    """Add order rows (see ``order_row``) to the rollups; the caller commits.
+
+    Pass ``rollup_slot(order_id)`` as ``slot`` so concurrent orders spread
+    over different rows.
+    """
+    apply_deltas(db, *aggregate(orders), slot=slot)
+
+
+# ------------------------------
+# Queries (rollup tables only)
+# ------------------------------
+def daily_revenue(db: Session, start: datetime.date, end: datetime.date) -> list:
+    rows = (
+        db.query(DailyRevenue.day, func.sum(DailyRevenue.order_count), func.sum(DailyRevenue.revenue))
+        .filter(DailyRevenue.day >= start, DailyRevenue.day <= end)
+        .group_by(DailyRevenue.day)
+        .order_by(DailyRevenue.day)
+        .all()
+    )
+    return [{"day": day.isoformat(), "orders": int(count), "revenue": round(revenue, 2)}
+            for day, count, revenue in rows]
+
+
+def top_items(db: Session, start: datetime.date, end: datetime.date, by="quantity", limit=10) -> list:
+    """[(menu_item_id, quantity, revenue)] summed over the range, best first by ``by``."""
+    quantity = func.sum(DailyItemSales.quantity)
+    revenue = func.sum(DailyItemSales.revenue)
+    rank = revenue if by == "revenue" else quantity
+    return (
+        db.query(DailyItemSales.menu_item_id, quantity, revenue)
+        .filter(DailyItemSales.day >= start, DailyItemSales.day <= end)
+        .group_by(DailyItemSales.menu_item_id)
+        .order_by(rank.desc(), DailyItemSales.menu_item_id)
+        .limit(limit)
+        .all()
+    )
+
+
+def payment_totals(db: Session, start: datetime.date, end: datetime.date) -> list:
+    rows = (
+        db.query(DailyPaymentTotals.payment_method,
+                 func.sum(DailyPaymentTotals.order_count), func.sum(DailyPaymentTotals.revenue))
+        .filter(DailyPaymentTotals.day >= start, DailyPaymentTotals.day <= end)
+        .group_by(DailyPaymentTotals.payment_method)
+        .order_by(func.sum(DailyPaymentTotals.revenue).desc())
+        .all()
+    )
+    return [
+        {"payment_method": method or None, "orders": int(count), "revenue": round(revenue, 2)}
+        for method, count, revenue in rows
+    ]
+
+
+# ------------------------------
+# Backfill
+# ------------------------------
+def _order_chunks(db: Session, after_id: int, upto_id=None, chunk_size=DEFAULT_BACKFILL_CHUNK):
+    """Yield ([order id, ...], [order_row, ...]) chunks for orders with after_id < id <= upto_id, in id order."""
+    last_id = after_id
+    while True:
+        query = db.query(Order.id, Order.order_time, Order.total_amount, Order.payment_method).filter(Order.id > last_id)
+        if upto_id is not None:
+            query = query.filter(Order.id <= upto_id)
+        orders = query.order_by(Order.id).limit(chunk_size).all()
+        if not orders:
+            return
+        first_id, last_id = orders[0].id, orders[-1].id
+        items_by_order = {}
+        for order_id, menu_item_id, quantity, price_per_unit in (
+            db.query(OrderItem.order_id, OrderItem.menu_item_id, OrderItem.quantity, OrderItem.price_per_unit)
+            .filter(OrderItem.order_id >= first_id, OrderItem.order_id <= last_id)
+            .all()
+        ):
+            items_by_order.setdefault(order_id, []).append((menu_item_id, quantity, price_per_unit))
+        yield [o.id for o in orders], [
+            order_row(o.order_time, o.total_amount, o.payment_method, items_by_order.get(o.id, ()))
+            for o in orders
+        ]
+
+
+def backfill(db: Session, chunk_size=DEFAULT_BACKFILL_CHUNK, rescan=DEFAULT_BACKFILL_RESCAN, log=print) -> int:
+    """Rebuild every rollup from the order tables and swap the result in at the end.
+
+    Orders up to the highest id at the start (``high``) are folded into
+    in-memory totals (about one entry per day and menu item) without
+    touching the rollup tables, so /analytics keeps serving the old totals
+    meanwhile. One transaction then deletes the live rows, reads orders
+    with id > high - ``rescan`` again, folds in the ones the scan didn't
+    see and inserts the result. An order in flight during the swap waits
+    on the delete's row locks and adds its own delta after the swap
+    commits.
+
+    An order that got an id at or below high - ``rescan`` but committed
+    only after the scan and before the swap is missed; raise ``rescan``
+    above the number of orders placed concurrently with one transaction,
+    or run the backfill while orders are quiet.
+    """
+    chunk_size = max(1, int(chunk_size))
+    high = db.query(func.max(Order.id)).scalar() or 0
+    tail = max(0, high - max(0, int(rescan)))
+    db.rollback()
+
+    totals = ({}, {}, {})
+    seen = set()  # ids above ``tail`` the scan folded in
+    done = 0
+    for order_ids, rows in _order_chunks(db, 0, high, chunk_size):
+        merge(totals, aggregate(rows))
+        seen.update(order_id for order_id in order_ids if order_id > tail)
+        done += len(rows)
+        db.rollback()
+        if log:
+            log(f"  rolled up {done} orders (through id {order_ids[-1]})")
+
+    try:
+        for model in (DailyRevenue, DailyItemSales, DailyPaymentTotals):
+            db.execute(delete(model))
+        for order_ids, rows in _order_chunks(db, tail, None, chunk_size):
+            unseen = [row for order_id, row in zip(order_ids, rows) if order_id not in seen]
+            merge(totals, aggregate(unseen))
+            done += len(unseen)
+        for model, rows in zip((DailyRevenue, DailyItemSales, DailyPaymentTotals), rollup_rows(*totals)):
+            if rows:
+                db.execute(insert(model), rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the sales rollup tables from existing orders")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_BACKFILL_CHUNK, help="orders per transaction")
+    parser.add_argument("--rescan", type=int, default=DEFAULT_BACKFILL_RESCAN,
+                        help="orders below the scan's last id to read again at the swap")
+    args = parser.parse_args()
+
+    from Resturant_Project.config import SessionLocal
+    db = SessionLocal()
+    try:
+        total = backfill(db, args.chunk_size, args.rescan)
+    finally:
+        db.close()
+    print(f"✅ Rollups rebuilt from {total} orders.")
+
+
+if __name__ == "__main__":
+    main()
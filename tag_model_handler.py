@@ -1,83 +1,126 @@
-import re
-import numpy as np
-import pandas as pd
-import faiss
-from sentence_transformers import SentenceTransformer
+import datetime
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from database.model import RestaurantInfo, MenuItem, Order, OrderItem, Service, Platform, Policy, Facility, Staff
-
-model = SentenceTransformer('all-MiniLM-L6-v2')
-question_texts = np.load("model/question_texts.npy", allow_pickle=True)
-df = pd.read_csv("model/restaurant_qa.csv")
-index = faiss.read_index("model/model.index")
-
-def get_model_response(user_query: str) -> str:
-    embedding = model.encode([user_query], convert_to_numpy=True)
-    _, indices = index.search(embedding, k=1)
-    best_idx = indices[0][0]
-    question = question_texts[best_idx]
-    answer = df[df['Question'] == question]['Answer'].values[0]
-    return answer
-
-def parse_order_query(query: str, db: Session):
-    query = query.lower()
-    menu_items = db.query(MenuItem).all()
-    item_map = {item.name.lower(): item for item in menu_items}
-
-    valid_items = []
-    missing_items = []
-
-    # All known menu item names
-    all_item_names = list(item_map.keys())
-
-    # Words that are not food items
-    STOPWORDS = {
-        'i', 'want', 'please', 'order', 'buy', 'can', 'could', 'me', 'to', 'give', 'get',
-        'need', 'would', 'like', 'have', 'some', 'with', 'without', 'and', 'a', 'an', 'just'
+from database.model import Order, OrderItem
+from Resturant_Project.config import BATCH_WINDOW_MS, BATCH_MAX_SIZE, INFERENCE_WORKERS, QUERY_CACHE_SIZE, QUERY_CACHE_TTL
+from inference_batcher import InferenceBatcher
+from model_runtime import runtime, get_runtime
+from text_utils import normalize_query
+from menu_matcher import get_menu_matcher
+from reference_data import get_snapshot
+from answer_store import NO_ANSWER
+from answer_templates import AnswerTemplate, compile_template
+from query_cache import QueryCache
+from metrics import registry, stage
+from sales_rollups import record_orders, order_row, rollup_slot
+
+NO_ANSWER_TEMPLATE = AnswerTemplate(NO_ANSWER)
+
+def get_model_responses(items: list) -> list:
+    """Answer (restaurant_id, query) pairs with compiled templates; a plain string uses the default index.
+
+    The encoder is shared, so the whole batch is encoded in one call; then
+    each restaurant's shard is searched once for its own rows.
+    """
+    runtime = get_runtime()
+    items = [item if isinstance(item, tuple) else (None, item) for item in items]
+    batch_sizes.observe(len(items))
+    with stage("encode"):
+        embeddings = runtime.encoder.encode([query for _, query in items], convert_to_numpy=True)
+
+    rows_by_restaurant = {}
+    for row, (restaurant_id, _) in enumerate(items):
+        rows_by_restaurant.setdefault(restaurant_id, []).append(row)
+
+    answers = [None] * len(items)
+    for restaurant_id, rows in rows_by_restaurant.items():
+        artifacts = runtime.artifacts_for(restaurant_id)
+        with stage("search"):
+            _, indices = artifacts.index.search(embeddings[rows], k=1)
+        with stage("answer_lookup"):
+            for row, hit in zip(rows, indices):
+                answers[row] = artifacts.templates[hit[0]] if hit[0] >= 0 else NO_ANSWER_TEMPLATE
+    return answers
+
+batch_sizes = registry.histogram(
+    "inference_batch_size", "Queries per encode/search batch.", buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+batcher = InferenceBatcher(
+    get_model_responses, window_ms=BATCH_WINDOW_MS, max_batch_size=BATCH_MAX_SIZE, workers=INFERENCE_WORKERS
+)
+query_cache = QueryCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+
+# Anything derived from the old index is dropped when a new build is loaded
+runtime.reload_hooks.append(query_cache.invalidate)
+
+def reload_index() -> None:
+    """Load the currently published artifacts now instead of waiting for the next check."""
+    get_runtime().reload_artifacts()
+
+# How each chat was answered: "exact", "cache", "semantic" or "order"
+path_counts = Counter()
+_path_lock = threading.Lock()
+
+def record_path(source: str) -> None:
+    with _path_lock:
+        path_counts[source] += 1
+
+def retrieval_stats() -> dict:
+    with _path_lock:
+        counts = dict(path_counts)
+    faq_total = sum(v for k, v in counts.items() if k != "order")
+    bypassed = counts.get("exact", 0) + counts.get("cache", 0)
+    return {
+        "paths": counts,
+        "bypass_rate": round(bypassed / faq_total, 4) if faq_total else 0.0,
+        "query_cache": query_cache.stats(),
     }
 
-    # Extract phrases like "2 greek salad", "1 tea"
-    order_phrases = re.findall(r"(\d+)?\s*([a-zA-Z ]+)", query)
-
-    already_added = set()
-
-    for quantity_str, raw_item_name in order_phrases:
-        item_name = raw_item_name.strip().lower()
-
-        # Remove stopwords from the phrase
-        filtered_words = [word for word in item_name.split() if word not in STOPWORDS]
-        if not filtered_words:
-            continue
-
-        cleaned_item_name = ' '.join(filtered_words)
-        quantity = int(quantity_str) if quantity_str else 1
-
-        matched = None
-        for name in all_item_names:
-            if name in cleaned_item_name and name not in already_added:
-                matched = name
-                break
-
-        if matched:
-            item = item_map[matched]
-            valid_items.append({
-                "menu_item_id": item.id,
-                "name": item.name,
-                "quantity": quantity,
-                "price_per_unit": item.price,
-            })
-            already_added.add(matched)
-        else:
-            # Avoid phrases like "give me", "get 1"
-            if cleaned_item_name not in already_added and len(cleaned_item_name) > 2:
-                missing_items.append(cleaned_item_name)
-                already_added.add(cleaned_item_name)
+def _completed(value) -> Future:
+    future = Future()
+    future.set_result(value)
+    return future
+
+def submit_model_query(user_query: str, restaurant_id=None):
+    """Return (future template answer, source) for a FAQ query.
+
+    Known training questions are answered straight from the lookup table,
+    repeats from the query cache, and only true misses reach the encoder.
+    ``restaurant_id`` picks that restaurant's index shard when it has one.
+    """
+    # One reference for the whole lookup so a hot reload can't mix two builds
+    artifacts = get_runtime().artifacts_for(restaurant_id)
+    # Restaurants without a shard share the default index and its cache entries
+    namespace = artifacts.restaurant_id
+    with stage("exact_lookup"):
+        row_id = artifacts.question_lookup.get(normalize_query(user_query))
+        answer = artifacts.templates[row_id] if row_id is not None else None
+    if row_id is not None:
+        return _completed(answer), "exact"
+
+    cached = query_cache.get(user_query, namespace)
+    if cached is not None:
+        return _completed(cached), "cache"
+
+    generation = query_cache.generation
+    future = batcher.submit((namespace, user_query))
+    future.add_done_callback(
+        lambda f: query_cache.set(user_query, f.result(), generation, namespace) if f.exception() is None else None
+    )
+    return future, "semantic"
 
-    return valid_items, missing_items
+def get_model_response(user_query: str, restaurant_id=None) -> str:
+    future, _ = submit_model_query(user_query, restaurant_id)
+    return future.result().text
 
 def create_order(user_id: int, items: list, db: Session) -> float:
     total = sum([item['quantity'] * item['price_per_unit'] for item in items])
-    order = Order(user_id=user_id, total_amount=total, payment_method="cash", delivery_address="", special_instructions="")
+    order = Order(user_id=user_id, total_amount=total, payment_method="cash", delivery_address="", special_instructions="",
+                  order_time=datetime.datetime.now())
     db.add(order)
     db.flush()
 
@@ -89,88 +132,151 @@ def create_order(user_id: int, items: list, db: Session) -> float:
             price_per_unit=item["price_per_unit"],
             customization=""
         ))
+    record_orders(db, [order_row(
+        order.order_time, total, order.payment_method,
+        [(item["menu_item_id"], item["quantity"], item["price_per_unit"]) for item in items],
+    )], rollup_slot(order.id))
     db.commit()
     return total
 
-def replace_tags_with_db_data(response: str, user_id: int, db: Session) -> str:
+def latest_order_total(user_id: int, db: Session):
+    order = db.query(Order.total_amount).filter_by(user_id=user_id).order_by(Order.id.desc()).first()
+    return order.total_amount if order else None
+
+def latest_order_totals(user_ids, db: Session) -> dict:
+    """Latest order total for many users in one query (None for users without orders).
+
+    Keyed by int user id, the type Order.user_id comes back as.
+    """
+    user_ids = {int(user_id) for user_id in user_ids}
+    totals = {user_id: None for user_id in user_ids}
+    if not user_ids:
+        return totals
+    latest_ids = (
+        db.query(func.max(Order.id))
+        .filter(Order.user_id.in_(user_ids))
+        .group_by(Order.user_id)
+    )
+    for user_id, total in db.query(Order.user_id, Order.total_amount).filter(Order.id.in_(latest_ids)).all():
+        totals[user_id] = total
+    return totals
+
+def replace_tags_with_db_data(response: str, user_id: int, db: Session, user_totals: dict = None,
+                              restaurant_id=None) -> str:
+    """Fill an answer (text or its compiled AnswerTemplate); pass ``user_totals``
+    (from latest_order_totals) to skip the per-user query.
+
+    Restaurant tags (<location>, <contact>, ...) come from ``restaurant_id``'s row.
+    """
+    template = response if isinstance(response, AnswerTemplate) else compile_template(response)
+    snapshot = get_snapshot(db, restaurant_id) if template.shared_tags else None
+
+    total = None
+    if template.user_tags:
+        # One query per response no matter how many per-user tags appear
+        if user_totals is not None and int(user_id) in user_totals:
+            total = user_totals[int(user_id)]
+        else:
+            total = latest_order_total(user_id, db)
+
     def tag_replacer(tag: str) -> str:
-        if tag == "menuitem":
-            items = db.query(MenuItem).all()
-            return "\n".join([f"🍽 {item.name} - Rs {item.price}" for item in items]) or "No menu items available."
-        elif tag == "location":
-            info = db.query(RestaurantInfo).first()
-            return f"📍 {info.name}, {info.address}" if info else "Location not found."
-        elif tag == "bill":
-            order = db.query(Order).filter_by(user_id=user_id).order_by(Order.id.desc()).first()
-            return f"🧾 Your total bill is Rs {order.total_amount}" if order else "No bill found."
-        elif tag == "contact":
-            info = db.query(RestaurantInfo).first()
-            return f"📞 {info.contact}" if info else "Contact info not available."
-        elif tag == "email":
-            info = db.query(RestaurantInfo).first()
-            return f"📧 {info.email}" if info else "Email not available."
-        elif tag == "name":
-            info = db.query(RestaurantInfo).first()
-            return info.name if info else "Name not available."
-        elif tag == "wifi":
-            info = db.query(RestaurantInfo).first()
-            return "✅ Available" if info and info.wifi else "❌ Not Available"
-        elif tag == "parking":
-            info = db.query(RestaurantInfo).first()
-            return "✅ Available" if info and info.parking else "❌ Not Available"
-        elif tag == "service":
-            services = db.query(Service).filter_by(enabled=True).all()
-            return ", ".join([s.name.capitalize() for s in services]) or "No active services."
-        elif tag == "platform":
-            platforms = db.query(Platform).filter_by(available=True).all()
-            return ", ".join([p.name for p in platforms]) or "No available platforms."
-        elif tag == "policy":
-            policies = db.query(Policy).all()
-            return "\n".join([f"{p.name.replace('_',' ').title()}: {p.value}" for p in policies]) or "No policies available."
-        elif tag == "staff":
-            staff = db.query(Staff).all()
-            return "\n".join([f"{s.role.title()}: {s.name}" for s in staff]) or "No staff listed."
+        if tag == "bill":
+            return f"🧾 Your total bill is Rs {total}" if total is not None else "No bill found."
         elif tag == "amount":
-            order = db.query(Order).filter_by(user_id=user_id).order_by(Order.id.desc()).first()
-            return f"Rs {order.total_amount}" if order else "Amount not found."
-        return f"<{tag}>"
+            return f"Rs {total}" if total is not None else "Amount not found."
+        return snapshot.tags.get(tag, f"<{tag}>")
 
-    tags_found = re.findall(r"<(.*?)>", response)
-    for tag in tags_found:
-        value = tag_replacer(tag)
-        response = response.replace(f"<{tag}>", value)
-    return response
+    return template.render(tag_replacer)
 
 def is_order_query(text: str) -> bool:
     order_keywords = ["order", "want", "buy", "get", "give me", "need", "i'll take", "can i have", "send", "serve"]
     return any(keyword in text.lower() for keyword in order_keywords)
 
-def get_final_chat_response(query: str, user_id: int, db: Session) -> str:
-    if is_order_query(query):
-        valid_items, missing_items = parse_order_query(query, db)
+def parse_order_query_with_suggestions(query: str, db: Session):
+    """(valid_items, missing_items, corrections, suggestions); misspelt items are fuzzy-matched."""
+    with stage("parse_order"):
+        return get_menu_matcher(db).parse_with_suggestions(query)
+
+def fuzzy_match_text(corrections: list, suggestions: list) -> str:
+    lines = [f"✏️ Took \"{c['phrase']}\" to mean {c['name']}." for c in corrections]
+    lines += [f"💡 \"{s['phrase']}\": did you mean {' or '.join(s['names'])}?" for s in suggestions]
+    return "\n\n" + "\n".join(lines) if lines else ""
 
-        if valid_items and not missing_items:
+def get_order_response(query: str, user_id: int, db: Session) -> str:
+    valid_items, missing_items, corrections, suggestions = parse_order_query_with_suggestions(query, db)
+    hints = fuzzy_match_text(corrections, suggestions)
+
+    if valid_items and not missing_items:
+        with stage("create_order"):
             total = create_order(user_id, valid_items, db)
-            items_text = "\n".join([f"✅ {item['quantity']} x {item['name']} (Rs {item['price_per_unit']})" for item in valid_items])
-            return f"🛒 Order placed successfully:\n{items_text}\n\n🧾 Total Bill: Rs {total:.2f}"
+        items_text = "\n".join([f"✅ {item['quantity']} x {item['name']} (Rs {item['price_per_unit']})" for item in valid_items])
+        return f"🛒 Order placed successfully:\n{items_text}\n\n🧾 Total Bill: Rs {total:.2f}{hints}"
 
-        elif valid_items and missing_items:
+    elif valid_items and missing_items:
+        with stage("create_order"):
             total = create_order(user_id, valid_items, db)
-            items_text = "\n".join([f"✅ {item['quantity']} x {item['name']} (Rs {item['price_per_unit']})" for item in valid_items])
-            missing_text = ", ".join(missing_items)
-            return (
-                f"🛒 Partial order placed:\n{items_text}\n\n🧾 Total Bill: Rs {total:.2f}\n\n"
-                f"❌ Sorry, we couldn't find: {missing_text} in our menu."
-            )
+        items_text = "\n".join([f"✅ {item['quantity']} x {item['name']} (Rs {item['price_per_unit']})" for item in valid_items])
+        missing_text = ", ".join(missing_items)
+        return (
+            f"🛒 Partial order placed:\n{items_text}\n\n🧾 Total Bill: Rs {total:.2f}\n\n"
+            f"❌ Sorry, we couldn't find: {missing_text} in our menu.{hints}"
+        )
 
-        elif not valid_items and missing_items:
-            missing_text = ", ".join(missing_items)
-            return f"❌ Sorry, none of the items you requested are available in our menu.\nUnavailable items: {missing_text}."
+    elif not valid_items and missing_items:
+        missing_text = ", ".join(missing_items)
+        return (
+            f"❌ Sorry, none of the items you requested are available in our menu.\nUnavailable items: {missing_text}."
+            f"{hints}"
+        )
 
-        else:
-            return "❓ Sorry, I couldn't understand your order. Could you please rephrase?"
+    else:
+        return "❓ Sorry, I couldn't understand your order. Could you please rephrase?"
+
+def get_final_chat_response(query: str, user_id: int, db: Session, restaurant_id=None):
+    """Return (answer, source), where source is the path that served it."""
+    with stage("intent"):
+        order_intent = is_order_query(query)
+    if order_intent:
+        record_path("order")
+        return get_order_response(query, user_id, db), "order"
+
+    future, source = submit_model_query(query, restaurant_id)
+    record_path(source)
+    with stage("model_wait"):
+        template = future.result()
+    with stage("render_tags"):
+        return replace_tags_with_db_data(template, user_id, db, restaurant_id=restaurant_id), source
+
+def get_final_chat_responses(messages: list, db: Session) -> list:
+    """Answer many (user_id, query) or (user_id, query, restaurant_id) messages,
+    sending all FAQ misses through the batcher at once.
+
+    Returns a list of (answer, source) in input order.
+    """
+    messages = [(m[0], m[1], m[2] if len(m) > 2 else None) for m in messages]
+    responses = [None] * len(messages)
+    with stage("intent"):
+        faq_positions = [pos for pos, (_, query, _) in enumerate(messages) if not is_order_query(query)]
+    faq_set = set(faq_positions)
+
+    # Queue the FAQ queries first so encoding overlaps with order handling
+    submitted = [submit_model_query(messages[pos][1], messages[pos][2]) for pos in faq_positions]
+
+    for pos, (user_id, query, _) in enumerate(messages):
+        if pos not in faq_set:
+            record_path("order")
+            responses[pos] = (get_order_response(query, user_id, db), "order")
 
-    raw_response = get_model_response(query)
-    return replace_tags_with_db_data(raw_response, user_id, db)
+    with stage("model_wait"):
+        templates = [future.result() for future, _ in submitted]
 
+    with stage("render_tags"):
+        # Per-user tags for the whole batch come from a single query
+        needs_totals = [messages[pos][0] for pos, template in zip(faq_positions, templates) if template.user_tags]
+        user_totals = latest_order_totals(needs_totals, db) if needs_totals else None
 
+        for pos, template, (_, source) in zip(faq_positions, templates, submitted):
+            user_id, _, restaurant_id = messages[pos]
+            record_path(source)
+            responses[pos] = (replace_tags_with_db_data(template, user_id, db, user_totals, restaurant_id), source)
+    return responses
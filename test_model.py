@@ -1,22 +1,25 @@
+import os
 import numpy as np
-import pandas as pd
 import faiss
 from sentence_transformers import SentenceTransformer
+from answer_store import open_answer_store, NO_ANSWER
+from model_runtime import current_release, migrate_legacy_build, ENCODER_NAME, INDEX_FILE, QUESTION_TEXTS_FILE
 
 # Load
-model = SentenceTransformer('all-MiniLM-L6-v2')
-question_texts = np.load("model/question_texts.npy", allow_pickle=True)
-df = pd.read_csv("model/restaurant_qa.csv")
-index = faiss.read_index("model/model.index")
+model = SentenceTransformer(ENCODER_NAME)
+migrate_legacy_build()
+_, artifact_dir = current_release()
+question_texts = np.load(os.path.join(artifact_dir, QUESTION_TEXTS_FILE), allow_pickle=True)
+answer_store = open_answer_store(artifact_dir)
+index = faiss.read_index(os.path.join(artifact_dir, INDEX_FILE))
 
 def get_answer(user_query):
     embedding = model.encode([user_query], convert_to_numpy=True)
     _, indices = index.search(embedding, k=3)
 
     for idx in indices[0]:
-        question = question_texts[idx]
-        answer = df[df['Question'] == question]['Answer'].values[0]
-        return answer
+        # -1 means the index found no neighbour
+        return answer_store.get(idx) if idx >= 0 else NO_ANSWER
 
 # Test
 while True:
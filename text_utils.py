@@ -0,0 +1,16 @@
+import re
+
+_APOSTROPHES = re.compile(r"['’`]")
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace.
+
+    "What time do you close?" and "what time do you   close" normalize to the
+    same string, so they share cache entries and exact-match lookups.
+    """
+    text = _APOSTROPHES.sub("", str(text).lower())
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
@@ -1,20 +1,169 @@
+import argparse
+import datetime
+import hashlib
+import os
+import shutil
 import pandas as pd
 import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
-import os
+from answer_store import write_answer_store, write_question_lookup, ANSWER_OFFSETS_FILE, ANSWER_BLOB_FILE, QUESTION_LOOKUP_FILE
+from index_builder import INDEX_TYPES, build_index
+from Resturant_Project.config import FAISS_INDEX_TYPE
+from model_runtime import (
+    ENCODER_NAME, MODEL_DIR, INDEX_FILE, QUESTION_TEXTS_FILE, QA_FILE, RELEASES_DIR, CURRENT_FILE, SHARDS_DIR,
+    shard_dir,
+)
+
+EMBEDDING_CACHE_FILE = "embedding_cache.npz"
+QA_PATH = os.path.join(MODEL_DIR, QA_FILE)
+EMBEDDING_CACHE_PATH = os.path.join(MODEL_DIR, EMBEDDING_CACHE_FILE)
+KEEP_RELEASES = 3
+
+
+def question_key(text: str) -> str:
+    # The encoder name is part of the key so switching models can't reuse stale vectors
+    return hashlib.sha1(f"{ENCODER_NAME}\0{text}".encode("utf-8")).hexdigest()
+
+
+def load_embedding_cache(path=EMBEDDING_CACHE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    data = np.load(path)
+    return dict(zip(data["keys"].tolist(), data["embeddings"]))
+
+
+def save_embedding_cache(cache: dict, path=EMBEDDING_CACHE_PATH) -> None:
+    keys = list(cache.keys())
+    embeddings = np.stack([cache[k] for k in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, keys=np.array(keys), embeddings=embeddings)
+    os.replace(tmp_path, path)
+
+
+def encode_texts(model, texts, chunk_size=1024, workers=1):
+    """Encode texts in chunks, optionally spread over a process pool."""
+    if not texts:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    if workers > 1:
+        pool = model.start_multi_process_pool(["cpu"] * workers)
+        try:
+            return model.encode_multi_process(texts, pool, chunk_size=chunk_size)
+        finally:
+            model.stop_multi_process_pool(pool)
+
+    chunks = []
+    for start in range(0, len(texts), chunk_size):
+        chunks.append(model.encode(texts[start:start + chunk_size], convert_to_numpy=True))
+        print(f"  encoded {min(start + chunk_size, len(texts))}/{len(texts)}")
+    return np.vstack(chunks)
+
+
+def build_embeddings(model, question_texts, incremental, chunk_size, workers, cache_path=EMBEDDING_CACHE_PATH):
+    if not incremental:
+        return encode_texts(model, question_texts, chunk_size, workers).astype(np.float32)
+
+    cache = load_embedding_cache(cache_path)
+    keys = [question_key(q) for q in question_texts]
+    missing = sorted({k: q for k, q in zip(keys, question_texts) if k not in cache}.items())
+    hits = sum(1 for k in keys if k in cache)
+    print(f"Embedding cache: {hits} hits, {len(question_texts) - hits} misses, {len(missing)} unique to encode")
+
+    if missing:
+        new_vectors = encode_texts(model, [q for _, q in missing], chunk_size, workers)
+        for (key, _), vector in zip(missing, new_vectors):
+            cache[key] = vector.astype(np.float32)
+
+    # Only keep vectors for questions that still exist
+    save_embedding_cache({k: cache[k] for k in keys}, cache_path)
+    return np.stack([cache[k] for k in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+
+
+def write_artifacts(out_dir, question_texts, answers, embeddings, index_type=FAISS_INDEX_TYPE):
+    os.makedirs(out_dir, exist_ok=True)
+    index = build_index(index_type, embeddings)
+    faiss.write_index(index, os.path.join(out_dir, INDEX_FILE))
+    np.save(os.path.join(out_dir, QUESTION_TEXTS_FILE), np.array(question_texts))
+    write_question_lookup(question_texts, os.path.join(out_dir, QUESTION_LOOKUP_FILE))
+    write_answer_store(
+        answers,
+        os.path.join(out_dir, ANSWER_OFFSETS_FILE),
+        os.path.join(out_dir, ANSWER_BLOB_FILE),
+    )
+
+
+def publish_release(question_texts, answers, embeddings, model_dir=MODEL_DIR, index_type=FAISS_INDEX_TYPE):
+    """Write a complete build to its own directory, then flip model/CURRENT to it.
+
+    A running app only ever sees a finished build: os.replace on the pointer
+    file is atomic, and ModelRuntime picks the new version up on its next check.
+    """
+    releases = os.path.join(model_dir, RELEASES_DIR)
+    # Microsecond timestamps are unique per build and sort in build order
+    version = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    write_artifacts(os.path.join(releases, version), question_texts, answers, embeddings, index_type)
+
+    pointer = os.path.join(model_dir, CURRENT_FILE)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+
+    # Old releases may still be mapped by running workers, so keep a few around
+    for old in sorted(os.listdir(releases))[:-KEEP_RELEASES]:
+        if old != version:
+            shutil.rmtree(os.path.join(releases, old), ignore_errors=True)
+    return version
+
+
+def train(model, model_dir, args):
+    """Build and publish one index from ``model_dir``/restaurant_qa.csv."""
+    df = pd.read_csv(os.path.join(model_dir, QA_FILE))
+    question_texts = df['Question'].tolist()
+    # Each shard keeps its own cache, since pruning drops vectors for other shards' questions
+    question_embeddings = build_embeddings(model, question_texts, args.incremental, args.chunk_size, args.workers,
+                                           os.path.join(model_dir, EMBEDDING_CACHE_FILE))
+
+    # Answer for each index row, so lookups don't need the CSV at serve time.
+    # Duplicate questions keep the first answer, as the old DataFrame lookup did.
+    first_answer = {}
+    for question, answer in zip(df['Question'], df['Answer']):
+        first_answer.setdefault(question, answer)
+
+    return publish_release(question_texts, [first_answer[q] for q in question_texts], question_embeddings,
+                           model_dir=model_dir, index_type=args.index_type)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the FAQ retrieval index from restaurant_qa.csv")
+    parser.add_argument("--incremental", action="store_true",
+                        help="reuse cached embeddings and only encode new or changed questions")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="questions per encode call")
+    parser.add_argument("--workers", type=int, default=1, help="encoder processes (1 = in-process)")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=FAISS_INDEX_TYPE,
+                        help="FAISS index to build (default from FAISS_INDEX_TYPE; compare with benchmarks/eval_retrieval.py)")
+    parser.add_argument("--restaurant-id", type=int, action="append", dest="restaurant_ids",
+                        help=f"build this restaurant's shard from {MODEL_DIR}/{SHARDS_DIR}/<id>/{QA_FILE} (repeatable)")
+    parser.add_argument("--all-shards", action="store_true",
+                        help=f"build every {MODEL_DIR}/{SHARDS_DIR}/<id>/ that has a {QA_FILE}")
+    args = parser.parse_args()
 
-df = pd.read_csv("model/restaurant_qa.csv")
-model = SentenceTransformer('all-MiniLM-L6-v2')
+    targets = [shard_dir(restaurant_id) for restaurant_id in args.restaurant_ids or []]
+    if args.all_shards:
+        shards_root = os.path.join(MODEL_DIR, SHARDS_DIR)
+        if os.path.isdir(shards_root):
+            targets += [
+                os.path.join(shards_root, name) for name in sorted(os.listdir(shards_root))
+                if name.isdigit() and os.path.exists(os.path.join(shards_root, name, QA_FILE))
+            ]
+    if not targets:
+        targets = [MODEL_DIR]
 
-question_texts = df['Question'].tolist()
-question_embeddings = model.encode(question_texts, convert_to_numpy=True)
+    # One encoder for every build
+    model = SentenceTransformer(ENCODER_NAME)
+    for model_dir in dict.fromkeys(targets):
+        version = train(model, model_dir, args)
+        print(f"✅ Model trained and saved to {model_dir} (release {version}, {args.index_type} index).")
 
-dimension = question_embeddings.shape[1]
-index = faiss.IndexFlatL2(dimension)
-index.add(question_embeddings)
 
-os.makedirs("model", exist_ok=True)
-faiss.write_index(index, "model/model.index")
-np.save("model/question_texts.npy", np.array(question_texts))
-print("✅ Model trained and saved.")
+if __name__ == "__main__":
+    main()